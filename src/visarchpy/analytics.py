@@ -4,7 +4,10 @@ Author: M.G. Garcia
 """
 
 import os
-import matplotlib
+from concurrent.futures import ThreadPoolExecutor
+from matplotlib import colormaps
+from matplotlib.axes import Axes
+from matplotlib.colors import Colormap
 import numpy as np
 import matplotlib.patches as patches
 import matplotlib.pyplot as plt
@@ -13,6 +16,7 @@ from PIL import Image, ImageFile
 from typing import List, Any
 from matplotlib.colors import Normalize
 from matplotlib.cm import ScalarMappable
+from matplotlib.collections import PatchCollection
 from visarchpy.models import KmeansBbox20
 
 # This is needed to avoid errors when loading images with
@@ -23,6 +27,7 @@ ImageFile.LOAD_TRUNCATED_IMAGES = True
 def get_image_paths(directory: str, extensions: List[str] = None) -> List[str]:
     """
     Returns a list of file paths for all image files in the given directory.
+    Subdirectories are not included.
 
     Parameters
     ----------
@@ -38,30 +43,35 @@ def get_image_paths(directory: str, extensions: List[str] = None) -> List[str]:
         A list of file paths for all image files in the directory.
     """
 
-    # If extensions is None, set it to a list of all image extensions
-    image_extensions = extensions
+    # If extensions is None, all files are included
+    image_extensions = tuple(ext.lower() for ext in extensions or ())
 
-    image_paths = []
-    for filename in os.listdir(directory):
-
-        if image_extensions is None:
-            image_paths.append(os.path.join(directory, filename))
-        elif extensions is not None:
-            # filter by extension
-            if any(filename.lower().endswith(ext) for ext in image_extensions):
-                image_paths.append(os.path.join(directory, filename))
+    with os.scandir(directory) as entries:
+        image_paths = [entry.path for entry in entries
+                       if entry.is_file() and
+                       (not image_extensions or
+                        entry.name.lower().endswith(image_extensions))]
     return image_paths
 
 
+def _read_image_size(image_path: str) -> tuple:
+    """Reads the size (width, height) of an image from its header."""
+
+    with Image.open(image_path) as image:
+        return image.size
+
+
 def plot_bboxes(images: List[str],
-                cmap: str = 'cool',
+                cmap: str | Colormap = 'cool',
                 predictor: Any = None,
                 show: bool = True,
                 size: int = 10,
                 resolution: int = 300,
                 scale_factor: float = 1.0,
                 max_image_size: int = 89478485,
-                save_to_file: str = None) -> None:
+                save_to_file: str = None,
+                labels: List[int] = None,
+                ax: Axes = None) -> None:
     """
     Creates a plot of the bounding boxes organize concentrically for the given
     images.This type of plot is useful for visualizing the distribution sizes
@@ -71,9 +81,9 @@ def plot_bboxes(images: List[str],
     ----------
     image_paths: List[str]
         A list of image file paths.
-    cmap: str
-        Name of the matplotlib color map to be used. Consult the matplotlib
-        documentation for valid values.
+    cmap: str | Colormap
+        Name of the matplotlib color map to be used, or a Colormap object.
+        Consult the matplotlib documentation for valid values.
     predictor: Kmeans
         A clustering Kmeans (Scikit Learn) trained model for assing a label
         and color to each image bounding box. If None, a pretained model with
@@ -81,7 +91,7 @@ def plot_bboxes(images: List[str],
     show: bool
         Shows plot. Default is True.
     size: int
-        Size of the figure plot in inches. Default is 10. This value influences
+        Width of the figure plot in inches. Default is 10. This value influences
         the quality of the plot when saving to a file.
     resolution: int
         Resolution of the plot  and figure in dots per inch (dpi).
@@ -97,6 +107,15 @@ def plot_bboxes(images: List[str],
         size of an image in pixels that can be stored in a 32-bit system.
     save_to_file: str
         Path to a PNG file to save the plot. If None, no file is saved.
+    labels: List[int]
+        Cluster labels of the images, in the same order as the images, as
+        computed by the predictor (e.g. the `labels_` attribute of a fitted
+        Kmeans model). Labels must be given together with the `predictor`
+        that computed them, and one per image, otherwise ValueError is
+        raised. If None, labels are computed with the predictor.
+    ax: Axes
+        Matplotlib axes to draw the plot on. This allows reusing a figure
+        across several calls. If None, a new figure is created.
 
     Returns
     -------
@@ -105,7 +124,9 @@ def plot_bboxes(images: List[str],
     Raises
     ------
 
-    Warning: If an image has no bounding box in the alpha channel.
+    ValueError: If labels are given without a predictor, or if the number of
+                labels and images differ.
+
     Warning: Decompression Bomb. If an image is larger than the maximum
              size allowed for a 32-bit system.
     Killed: If system runs out of memory during plotting. Adjusting the
@@ -115,7 +136,10 @@ def plot_bboxes(images: List[str],
 
     # Plot/Figure settings and metadata
     # Create a figure and axis object
-    fig, ax = plt.subplots()
+    if ax is None:
+        fig, ax = plt.subplots()
+    else:
+        fig = ax.figure
     fig.set_dpi(resolution)  # set resolution
     # make plot set the axis limits
     ax.plot()
@@ -128,13 +152,25 @@ def plot_bboxes(images: List[str],
     ax.tick_params(labelsize=label_fontsize)
 
     # create color map
-    _cmap = matplotlib.colormaps[cmap]
-
-    # list of PIL.Image objects
-    images = [Image.open(image_path) for image_path in images if
-              Image.open(image_path).size != 0 and
-              Image.open(image_path).size[0] *
-              Image.open(image_path).size[1] <= max_image_size]
+    _cmap = colormaps[cmap] if isinstance(cmap, str) else cmap
+
+    # list of image sizes (width, height). Sizes are read from the
+    # image headers in parallel, pixel data is never decoded
+    with ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) * 4)
+                            ) as executor:
+        all_sizes = list(executor.map(_read_image_size, images))
+    plotted = [image_size[0] * image_size[1] <= max_image_size
+               for image_size in all_sizes]
+    image_sizes = [image_size for image_size, keep in
+                   zip(all_sizes, plotted) if keep]
+
+    if labels is not None:
+        if not predictor:
+            raise ValueError("labels must be used together with the\
+                             predictor that computed them")
+        if len(labels) != len(all_sizes):
+            raise ValueError(f"Number of labels ({len(labels)}) and images\
+                             ({len(all_sizes)}) must be the same")
 
     if predictor:
         k_predictor = predictor
@@ -144,18 +180,14 @@ def plot_bboxes(images: List[str],
 
     # collect image widths and heights to determine
     # image  maximum size
-    widths = []
-    heights = []
-    [(widths.append(image.width * scale_factor),
-      heights.append(image.height * scale_factor))
-     for image in images]
+    widths = [width * scale_factor for width, _ in image_sizes]
+    heights = [height * scale_factor for _, height in image_sizes]
 
     max_width = max(widths)
     max_height = max(heights)
     ratio = max_width / max_height
-    # Set the figure to a size while keeping the aspect ratio
-    fig.set_figwidth(size * ratio)
-    fig.set_figheight(size / ratio)
+    # Set the figure width to size while keeping the aspect ratio
+    fig.set_size_inches(size, size / ratio)
 
     # Sort the clusters so that labels are organized in increasing order
     # This makes sure that the colors are distributed along the
@@ -164,14 +196,13 @@ def plot_bboxes(images: List[str],
     sorted_label = np.zeros_like(idx)
     sorted_label[idx] = np.arange(idx.shape[0])
 
-    # Collect prediction values and images in preparation for
+    # Predict the labels of all images at once, in preparation for
     # plotting. This ensures the predict function is called
     # only once.
-    predictions = []
-    pil_images = []
-    [(predictions.append(k_predictor.predict([[image.width, image.height]])),
-        pil_images.append(image))
-        for image in images]
+    if labels is not None:
+        predictions = np.asarray(labels)[plotted]
+    else:
+        predictions = k_predictor.predict(np.array(image_sizes))
 
     # This is used to strech the colors
     # in the color map using the range of
@@ -180,63 +211,51 @@ def plot_bboxes(images: List[str],
     min_sorted_label = min(sorted_label[predictions])
 
     box_tracker = {}  # keeps track of size and count of boxes already plotted
+    rectangles = []
+    colors = []
     # plot bounding boxes
-    for prediction, image in tqdm(zip(predictions, pil_images),
-                                  desc='Plotting...', unit='bboxes'):
-        # Get the bounding box for the current image
-        # This throws an TypeError if image has an alpha channel by no pixels
-        # in that channel. This is the default as of Pillow 10.3.0
-        # See: https://pillow.readthedocs.io/en/stable/reference/Image.html
-        # #PIL.Image.Image.getbbox
-
-        if image.size not in box_tracker:
-            box_tracker[image.size] = 1  # initialize box count
+    for prediction, image_size in tqdm(zip(predictions, image_sizes),
+                                       desc='Plotting...', unit='bboxes'):
 
-            bbox = image.getbbox()  # Will return None if alpha channel
-            # is empty
+        if image_size not in box_tracker:
+            box_tracker[image_size] = 1  # initialize box count
 
             # trasforms predicted label to sorted label
             prediction = sorted_label[prediction]
             # notmalize to 0-1
-            norm_prediction = prediction[0]/(max_sorted_label -
-                                             min_sorted_label)
+            norm_prediction = prediction/(max_sorted_label -
+                                          min_sorted_label)
             rgba = _cmap(norm_prediction)  # assignes color for rectangle
 
-            if bbox is None:
-                # Skip creating an rectangle image has no bounding
-                # box (read issues with alpha channel above)
-                Warning(f'Image {image.filename} has no bounding box.\
-                        Skipping.')
-                continue
-            else:
-                # Create a rectangle patch for the bounding box
-                # Origin is set to center of drawing aread and
-                # boxes are drawn concentrically.
-                rec_width = image.width * scale_factor
-                rec_height = image.height * scale_factor
-
-                rec_x = bbox[0] * scale_factor
-                rec_y = bbox[1] * scale_factor
-                rect = patches.Rectangle((rec_x - 0.5 * rec_width, rec_y -
-                                          0.5 * rec_height),
-                                         rec_width, rec_height,
-                                         linewidth=1, edgecolor=rgba,
-                                         facecolor='none')
-
-                # Plot the bounding box
-                ax.add_patch(rect)
-            # free some memory. It is convenient with many or large inputs
-            del image
+            # Create a rectangle patch for the bounding box (0, 0, w, h)
+            # Origin is set to center of drawing aread and
+            # boxes are drawn concentrically.
+            rec_width = image_size[0] * scale_factor
+            rec_height = image_size[1] * scale_factor
+
+            rectangles.append(patches.Rectangle((-0.5 * rec_width,
+                                                 -0.5 * rec_height),
+                                                rec_width, rec_height))
+            colors.append(rgba)
 
         else:
-            box_tracker[image.size] = box_tracker.get(image.size) + 1
+            box_tracker[image_size] = box_tracker.get(image_size) + 1
+
+    # Plot all bounding boxes at once
+    ax.add_collection(PatchCollection(rectangles, linewidth=1,
+                                      edgecolor=colors, facecolor='none'))
+    # Set axis limits to the extent of the largest bounding boxes,
+    # with a small margin so they don't overlap the axes
+    ax.set_xlim(-0.55 * max_width, 0.55 * max_width)
+    ax.set_ylim(-0.55 * max_height, 0.55 * max_height)
+    ax.set_aspect('equal')
 
     # add plot legend
     # plots colorbar after normalizing the values of he sorted
     # prediction labels
     norm = Normalize(vmin=min_sorted_label, vmax=max_sorted_label)
     scalar_mappable = ScalarMappable(norm=norm, cmap=_cmap)
-    color_bar = plt.colorbar(scalar_mappable, ax=ax)
+    color_bar = fig.colorbar(scalar_mappable, ax=ax)
     color_bar.set_label('Image size (w x h)', fontsize=label_fontsize)
 
     color_bar.ax.tick_params(labelsize=label_fontsize)
@@ -244,11 +263,11 @@ def plot_bboxes(images: List[str],
     min_size_label = str(min(box_tracker.keys()))
     max_size_label = str(max(box_tracker.keys()))
     color_bar.set_ticks(
-        [min_sorted_label[0], max_sorted_label[0]],
+        [min_sorted_label, max_sorted_label],
         labels=[min_size_label, max_size_label])
 
     if save_to_file:
-        plt.savefig(save_to_file, dpi=resolution, bbox_inches='tight')
+        fig.savefig(save_to_file, dpi=resolution, bbox_inches='tight')
         print(f'Plot saved to {save_to_file}')
 
    
@@ -3,15 +3,32 @@ Extracts captions from PDF pages
 """
 
 import re
-from pdfminer.layout import LTTextContainer, LTImage
-from typing import List
-from shapely.geometry import Polygon
+from functools import lru_cache
+from weakref import WeakKeyDictionary, WeakSet
+import numpy as np
+import shapely
+from shapely import STRtree
+from pdfminer.layout import LTTextContainer, LTTextBox, LTImage
+from typing import List, Tuple
 from dataclasses import dataclass, field
 from visarchpy.utils import convert_mm_to_point, convert_dpi_to_point
 from typing import Optional
 
+CAPTION_KEYWORDS = ['figure', 'caption', 'figuur']
 
-@dataclass
+# text of pdfminer elements, entries are removed with the elements
+_TEXT_CACHE: WeakKeyDictionary = WeakKeyDictionary()
+
+# lowercase keywords of compiled keyword patterns whose keywords are all
+# plain words. These are matched with str.startswith instead of the regex
+_KEYWORD_PREFIXES: WeakKeyDictionary = WeakKeyDictionary()
+
+# compiled keyword patterns that can only match the first line of a text.
+# Other patterns are matched against the full text
+_FIRST_LINE_PATTERNS: WeakSet = WeakSet()
+
+
+@dataclass(slots=True, frozen=True)
 class BoundingBox:
     """
     represents a bounding box of a PDF element in the form (x0, y0, x1, y1).
@@ -35,8 +52,9 @@ class BoundingBox:
             raise TypeError("unit must be either 'mm', 'pt' (points), or an\
                             integer representing DPI")
 
-        self.width = self.coords[2] - self.coords[0]
-        self.height = self.coords[3] - self.coords[1]
+        # instances are frozen, derived fields are set once here
+        object.__setattr__(self, 'width', self.coords[2] - self.coords[0])
+        object.__setattr__(self, 'height', self.coords[3] - self.coords[1])
 
     def bbox(self) -> tuple:
         """
@@ -80,22 +98,150 @@ class BoundingBox:
                      for coord in self.coords)
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class Offset:
     """
-    represents an offset in the form (distance, unit).
+    represents an offset in the form (distance, unit). The distance is also
+    available in the units used by bounding boxes (converted_distance):
+    points (pt) for offsets in mm, and pixels for offsets in px.
     """
 
     distance: float
     unit: str
+    converted_distance: float = field(init=False, repr=False)
 
     def __post_init__(self):
         if self.unit not in ["mm", "px"]:
             raise ValueError("unit must be either mm or px (pixels)")
 
+        if self.unit == "mm":  # Bbox from pdfminer are in points
+            converted = convert_mm_to_point(self.distance)
+        else:
+            converted = self.distance
+        object.__setattr__(self, 'converted_distance', converted)
+
+
+def _get_text(text_element: LTTextContainer) -> str:
+    """Returns the text of a pdfminer element. The text is computed only
+    once per element, as get_text() rebuilds it from the children on every
+    call."""
+
+    text = _TEXT_CACHE.get(text_element)
+    if text is None:
+        text = _TEXT_CACHE[text_element] = text_element.get_text()
+    return text
+
+
+@lru_cache(maxsize=32)
+def _compile_keyword_regex(keywords: Tuple[str, ...]) -> re.Pattern:
+    """Compiles a regular expression that matches text starting with any of
+    the keywords. Keywords are matched literally and case insensitive.
+    Compiled expressions are cached per set of keywords."""
+
+    # constructs regular expression to match
+    # textboxes that start with
+    words = []
+    for word in keywords:
+        if not isinstance(word, str):
+            raise TypeError(f"Keyword must be of type string. {word} has \
+                             type {type(word)}")
+        words.append(re.escape(word.lower()))
+
+    pattern = re.compile(r'^(?:' + '|'.join(words) + r')', re.IGNORECASE)
+    if not any('\n' in word for word in keywords):
+        _FIRST_LINE_PATTERNS.add(pattern)
+    if all(re.fullmatch(r'[a-zA-Z]+', word) for word in keywords):
+        _KEYWORD_PREFIXES[pattern] = tuple(word.lower() for word in keywords)
+    return pattern
+
+
+# matches text that starts with any of the default caption keywords
+CAPTION_RE = _compile_keyword_regex(tuple(CAPTION_KEYWORDS))
+
+
+def compile_caption_pattern(keywords: List[str] = CAPTION_KEYWORDS
+                            ) -> re.Pattern:
+    """
+    Compiles a regular expression that matches text starting with any of
+    the caption keywords. Matches are case insensitive. Use it with
+    ``find_caption_by_pattern`` to compile the keywords only once for many
+    text elements.
+
+    Parameters
+    ----------
+    keywords: list
+        list of keywords to match. Keywords are matched literally (special
+        characters are escaped).
+
+    Returns
+    -------
+    re.Pattern
+        compiled regular expression
+
+    Raises
+    ------
+    ValueError
+        if list of keywords is empty
+    TypeError
+        if keyword is not a string
+    """
+
+    if len(keywords) == 0:
+        raise ValueError("List of keywords cannot be empty. Try adding adding\
+                         at least one keyword")
+
+    return _compile_keyword_regex(tuple(keywords))
+
+
+def find_caption_by_pattern(text_element: LTTextContainer,
+                            pattern: re.Pattern) -> LTTextContainer | bool:
+    """
+    Matches the beginning of a PDF document element of type text with a
+    compiled caption pattern.
+
+    Parameters
+    ----------
+    text_element: LTTextContainer object
+        text element to be analyzed
+    pattern: re.Pattern
+        compiled pattern as returned by ``compile_caption_pattern``. Other
+        compiled patterns are matched against the full text of the element.
+
+    Returns
+    -------
+    LTTextContainer object or bool
+        False if no match is found, otherwise the text element
+    """
+
+    if not isinstance(text_element, LTTextContainer):
+        return False
+
+    if isinstance(text_element, LTTextBox) and \
+            pattern in _FIRST_LINE_PATTERNS:
+        # keyword patterns are anchored to the start of the text and the
+        # lines of a text box are separated by new lines, so matching the
+        # first line is enough. This avoids joining the text of long
+        # paragraphs. Other patterns may match across lines.
+        first_line = next(iter(text_element), None)
+        text = _get_text(first_line) if first_line is not None else ''
+    else:
+        text = _get_text(text_element)
+
+    prefixes = _KEYWORD_PREFIXES.get(pattern)
+    if prefixes is not None:
+        # plain-word keywords don't need the regex engine
+        matched = text[:max(map(len, prefixes))].lower().startswith(prefixes)
+    else:
+        matched = pattern.match(text) is not None
+
+    if matched:
+        return text_element
+    else:
+        return False
+
 
 def find_caption_by_text(text_element: LTTextContainer,
-                         keywords: List = ['figure', 'caption', 'figuur']
+                         keywords: List[str] = CAPTION_KEYWORDS
                          ) -> LTTextContainer | bool:
     """Does text analysis by matching caption keywords (e.g, figure, caption,
     Figure) in a PDF document element of type text using regular expressions.
@@ -106,7 +252,8 @@ def find_caption_by_text(text_element: LTTextContainer,
     text_element: LTTextContainer object
         text element to be analyzed
     keywords: list
-        list of keywords to match in the text element
+        list of keywords to match in the text element. Keywords are matched
+        literally (special characters are escaped).
 
     Returns
     -------
@@ -122,30 +269,173 @@ def find_caption_by_text(text_element: LTTextContainer,
         if keyword is not a string
     """
 
-    if len(keywords) == 0:
-        raise ValueError("List of keywords cannot be empty. Try adding adding\
-                         at least one keyword")
-    else:
-        # constructs regular expression to match
-        # textboxes that start with
-        words = []
-        separator = '|'
-        for word in keywords:
-            if not isinstance(word, str):
-                raise TypeError(f"Keyword must be of type string. {word} has \
-                                 type {type(word)}")
-            words.append('^'+word.lower())
-        regex = separator.join(words)
-
-    if isinstance(text_element, LTTextContainer) and re.search(regex, text_element.get_text().lower()):
-        return text_element
-    else:
-        return False
+    return find_caption_by_pattern(text_element,
+                                   compile_caption_pattern(keywords))
+
+
+# Search areas around an image bounding box (x0, y0, x1, y1) for each
+# direction. Each area is a box whose coordinates are given as pairs
+# (index of image coordinate, multiplier of offset distance), e.g.
+# (3, 1) is y1 + offset_distance.
+#
+#   all           up            down          right         left
+#  _________     _______
+# | _____   |   |_______|     +++++++++     +++++++ --    -- +++++++
+# | +   +   |   +++++++++     +       +     +     + | |  | | +     +
+# | +   +   |   +       +     +++++++++     +++++++ --    -- +++++++
+# | +++++   |   +++++++++     |_______|
+# |_________|
+#
+#   right-down (down-right)    left-up (up-left)
+#  ++++++++ --                  ___________
+#  +      + | |                | ++++++++++
+#  ++++++++ | |                | +        +
+#  |__________|                 --++++++++++
+_SEARCH_AREAS = {
+    "all": [((0, -1), (1, -1), (2, 1), (3, 1))],
+    "up": [((0, 0), (3, 0), (2, 0), (3, 1))],
+    "down": [((0, 0), (1, -1), (2, 0), (1, 0))],
+    "right": [((2, 0), (1, 0), (2, 1), (3, 0))],
+    "left": [((0, -1), (1, 0), (0, 0), (3, 0))],
+    "right-down": [((0, 0), (1, -1), (2, 1), (1, 0)),
+                   ((2, 0), (1, 0), (2, 1), (3, 0))],
+    "left-up": [((0, -1), (1, 0), (0, 0), (3, 1)),
+                ((0, -1), (3, 0), (2, 0), (3, 1))],
+}
+_SEARCH_AREAS[None] = _SEARCH_AREAS["all"]
+_SEARCH_AREAS["down-right"] = _SEARCH_AREAS["right-down"]
+_SEARCH_AREAS["up-left"] = _SEARCH_AREAS["left-up"]
+# the same search areas as (indices, multipliers) arrays of shape (areas, 4),
+# to compute the search areas of many images at once
+_SEARCH_AREA_ARRAYS = {
+    direction: (np.array([[index for index, _ in coord] for coord in areas]),
+                np.array([[multiplier for _, multiplier in coord]
+                          for coord in areas]))
+    for direction, areas in _SEARCH_AREAS.items()
+}
+
+
+def _expand_bbox(image_coords: tuple, offset_distance: float,
+                 direction: Optional[str] = None
+                 ) -> Tuple[List[tuple], Optional[tuple]]:
+    """
+    Expands the bounding box of an image (x0, y0, x1, y1) by an offset
+    distance in the given direction. The expanded areas are returned as
+    plain tuples of coordinates.
+
+    Returns
+    -------
+    Tuple[List[tuple], tuple | None]
+        Search areas, and bounding box of the image when it must be excluded
+        from the search areas (direction 'all'), otherwise None.
+    """
+
+    search_areas = [tuple(image_coords[index] + multiplier * offset_distance
+                          for index, multiplier in area)
+                    for area in _SEARCH_AREAS[direction]]
+
+    # the area covered by the image is a hole in the search area
+    image_hole = tuple(image_coords[:4]) if direction in ["all", None] \
+        else None
+
+    return search_areas, image_hole
+
+
+def _match_all(image_coords: tuple, text_coords: tuple,
+               offset_distance: float) -> bool:
+    """Checks if a text bounding box is within offset distance of an image
+    bounding box in all directions, excluding the area of the image. Both
+    bounding boxes and the offset must be in the same units."""
+
+    x0, y0, x1, y1 = image_coords[:4]
+    tx0, ty0, tx1, ty1 = text_coords[:4]
+    if tx0 > x0 and tx1 < x1 and ty0 > y0 and ty1 < y1:
+        return False  # inside the image
+    return (x0 - offset_distance <= tx1 and tx0 <= x1 + offset_distance and
+            y0 - offset_distance <= ty1 and ty0 <= y1 + offset_distance)
+
+
+def _image_coords(image_object: LTImage | BoundingBox,
+                  direction: Optional[str] = None) -> Tuple[tuple, str]:
+    """
+    Returns the coordinates of the bounding box of an image, and the
+    direction of the search areas in its coordinate system. See
+    ``find_caption_by_distance`` for the description of the parameters and
+    exceptions.
+    """
+
+    image_coords = image_object.bbox
+
+    if direction not in _SEARCH_AREAS:
+        raise ValueError("direction must be either right, left, down, up, \
+                         right-down, left-up, all")
+
+    if isinstance(image_object, BoundingBox):
+
+        if image_object.unit in ["mm", "pt"]:
+            image_coords = image_object.bbox()
+        elif isinstance(image_object.unit, int):
+            image_coords = image_object.bbox_px()
+
+            # Inverting the directions is necessary for OCR because
+            # the origin of the coordinate is on the top-left corner of
+            # the image. In layout analysis the origin is on the bottom-left
+            # corner of the image.
+            if direction == 'down':
+                direction = 'up'
+            elif direction == 'up':
+                direction = 'down'
+            else:
+                pass
+                # TODO: add other directions, and test
+
+        else:
+            raise TypeError("combination of units not supported")
+
+    return image_coords, direction
+
+
+def _search_areas(image_object: LTImage | BoundingBox, offset: Offset,
+                  direction: Optional[str] = None
+                 ) -> Tuple[List[tuple], Optional[tuple]]:
+    """
+    Computes the search areas around the bounding box of an image, as
+    axis-aligned boxes of the form (x0, y0, x1, y1). See
+    ``find_caption_by_distance`` for the description of the parameters and
+    exceptions.
+
+    Returns
+    -------
+    Tuple[List[tuple], tuple | None]
+        Search areas, and bounding box of the image when it must be excluded
+        from the search areas (direction 'all'), otherwise None.
+    """
+
+    image_coords, direction = _image_coords(image_object, direction)
+    return _expand_bbox(image_coords, offset.converted_distance, direction)
+
+
+def _text_coords(text_object: LTTextContainer | BoundingBox) -> tuple:
+    """Returns the coordinates of the bounding box of a text element."""
+
+    text_coords = text_object.bbox
+
+    if isinstance(text_object, BoundingBox):
+
+        if text_object.unit in ["mm", "pt"]:
+            text_coords = text_object.bbox()
+        elif isinstance(text_object.unit, int):
+            text_coords = text_object.bbox_px()
+
+        else:
+            raise TypeError("combination of units not supported")
+
+    return text_coords
 
 
 def find_caption_by_distance(image_object: LTImage | BoundingBox,
                              text_object: LTTextContainer | BoundingBox,
-                             offset: Offset, direction: str = None
+                             offset: Offset, direction: Optional[str] = None
                              ) -> LTTextContainer | bool:
     """
     Finds a text element withing a certain distance (offset)
@@ -172,6 +462,8 @@ def find_caption_by_distance(image_object: LTImage | BoundingBox,
         the directions the offeset will be applied around the image bounding
         box. Default None, which applies offect in 'all' directions.
         Posibile values: right, left, down, up, right-down, left-up, all.
+        'down-right' and 'up-left' are accepted as aliases of 'right-down'
+        and 'left-up'.
 
     Returns
     -------
@@ -190,255 +482,199 @@ def find_caption_by_distance(image_object: LTImage | BoundingBox,
         image bounding box.
     """
 
-    image_coords = image_object.bbox
-    text_coords = text_object.bbox
+    # fast path for the default direction with pdfminer elements, which
+    # don't need unit conversions
+    if direction in ["all", None] and not isinstance(image_object,
+                                                     BoundingBox) \
+            and not isinstance(text_object, BoundingBox):
+        if _match_all(image_object.bbox, text_object.bbox,
+                      offset.converted_distance):
+            return text_object
+        return False
 
-    if offset.unit == "mm":  # Bbox from pdfminer are in points
-        offset_distance = convert_mm_to_point(offset.distance)
+    search_areas, image_hole = _search_areas(image_object, offset, direction)
+    text_coords = _text_coords(text_object)
 
-    if direction not in ["right", "left", "down", "up", "right-down",
-                         "left-up", "all", None]:
-        raise ValueError("direction must be either right, left, down, up, \
-                         right-down, left-up, all")
+    # text elements that lay strictly inside the image are not matched
+    if image_hole is not None and (
+            text_coords[0] > image_hole[0] and text_coords[2] < image_hole[2]
+            and text_coords[1] > image_hole[1] and
+            text_coords[3] < image_hole[3]):
+        return False
 
-    if offset.unit == "px":
-        offset_distance = offset.distance
+    # search areas and text bounding boxes are axis-aligned, they
+    # intersect when they overlap (or touch) on both axes
+    for area in search_areas:
+        if (area[0] <= text_coords[2] and text_coords[0] <= area[2] and
+                area[1] <= text_coords[3] and text_coords[1] <= area[3]):
+            return text_object
 
-    if isinstance(image_object, BoundingBox):
+    return False
 
-        if image_object.unit in ["mm", "pt"]:
-            image_coords = image_object.bbox()
-        elif isinstance(image_object.unit, int):
-            image_coords = image_object.bbox_px()
 
-            # Inverting the directions is necessary for OCR because
-            # the origin of the coordinate is on the top-left corner of
-            # the image. In layout analysis the origin is on the bottom-left
-            # corner of the image.
-            if direction == 'down':
-                direction = 'up'
-            elif direction == 'up':
-                direction = 'down'
-            else:
-                pass
-                # TODO: add other directions, and test
+def find_captions_by_distance(image_objects: List[LTImage | BoundingBox],
+                              text_objects: List[LTTextContainer |
+                                                 BoundingBox],
+                              offset: Offset, direction: Optional[str] = None
+                              ) -> np.ndarray:
+    """
+    Finds the text elements within a certain distance (offset) from the
+    bounding boxes of several images at once. This is equivalent to calling
+    ``find_caption_by_distance`` for each pair of image and text elements,
+    but the bounding boxes are compared in a single vectorized operation.
 
-        else:
-            raise TypeError("combination of units not supported")
+    Parameters
+    ----------
+    image_objects: List[LTImage | BoundingBox]
+        Images whose bounding boxes will be used as reference.
+    text_objects: List[LTTextContainer | BoundingBox]
+        text elements whose bounding boxes will be compared with the image
+        bounding boxes.
+    offset: OffsetDistance object
+        distance from images within which the text elements will be searched.
+    direction: str
+        the directions the offeset will be applied around the image bounding
+        boxes. See ``find_caption_by_distance`` for possible values.
 
-    if isinstance(text_object, BoundingBox):
+    Returns
+    -------
+    np.ndarray
+        Boolean array of shape (number of images, number of texts). An
+        element [i, j] is True if text_objects[j] is within offset distance
+        of image_objects[i].
 
-        if text_object.unit in ["mm", "pt"]:
-            text_coords = text_object.bbox()
-        elif isinstance(text_object.unit, int):
-            text_coords = text_object.bbox_px()
+    Raises
+    ------
+    ValueError
+        if direction is not one of the following: right, left, down, up,
+        right-down, left-up, all
+    TypeError
+        if the units of a bounding box are not supported.
+    """
 
-        else:
-            raise TypeError("combination of units not supported")
+    if len(image_objects) == 0 or len(text_objects) == 0:
+        return np.zeros((len(image_objects), len(text_objects)), dtype=bool)
+
+    # the direction is resolved once, all images share the same units
+    images = [_image_coords(image, direction) for image in image_objects]
+    area_direction = images[0][1]
+    image_coords = np.array([coords[:4] for coords, _ in images], dtype=float)
+    # (images, areas per image, 4)
+    indices, multipliers = _SEARCH_AREA_ARRAYS[area_direction]
+    search_areas = (image_coords[:, indices] +
+                    multipliers * offset.converted_distance)
+    # (1, 1, texts, 4)
+    texts = np.array([_text_coords(text) for text in text_objects],
+                     dtype=float)[None, None, :, :4]
+    search_areas = search_areas[:, :, None, :]
+
+    mask = ((search_areas[..., 0] <= texts[..., 2]) &
+            (texts[..., 0] <= search_areas[..., 2]) &
+            (search_areas[..., 1] <= texts[..., 3]) &
+            (texts[..., 1] <= search_areas[..., 3])).any(axis=1)
+
+    if area_direction in ["all", None]:  # exclude texts inside the images
+        holes = image_coords[:, None, :]
+        texts = texts[0]
+        inside = ((texts[..., 0] > holes[..., 0]) &
+                  (texts[..., 2] < holes[..., 2]) &
+                  (texts[..., 1] > holes[..., 1]) &
+                  (texts[..., 3] < holes[..., 3]))
+        mask &= ~inside
+
+    return mask
+
+
+def build_text_index(text_objects: List[LTTextContainer | BoundingBox]
+                     ) -> STRtree:
+    """
+    Builds a spatial index (R-tree) of the bounding boxes of text elements.
+    Build the index once per page, and use it with
+    ``find_captions_by_index`` to search captions for every image on
+    the page.
 
-    width = abs(image_coords[2] - image_coords[0])
-    height = abs(image_coords[3] - image_coords[1])
-
-    if direction is None or direction == "all":
-        '''
-         ____________________
-        |    search area     |
-        |  ++++++++++++++++  |
-        |  +              +  |
-        |  +  image box   +  |
-        |  +              +  |
-        |  +              +  |
-        |  ++++++++++++++++  |
-        |____________________|
-
-        '''
-
-        search_area = Polygon((
-                              # bottom
-                              # coodinates [x, y, x, y]
-                              (image_coords[0] - offset_distance,
-                               image_coords[1] - offset_distance),
-                              (image_coords[2] + offset_distance,
-                               image_coords[1] - offset_distance),
-                              # top:
-                              (image_coords[2] + offset_distance,
-                               image_coords[3] + offset_distance),
-                              (image_coords[0] - offset_distance,
-                               image_coords[3] + offset_distance),
-                              (image_coords[0] - offset_distance,
-                               image_coords[1] - offset_distance),),
-                              holes=[((
-                               (image_coords[0], image_coords[1]),
-                               (image_coords[2], image_coords[1]),
-                               (image_coords[2], image_coords[3]),
-                               (image_coords[0], image_coords[3]),
-                               (image_coords[0], image_coords[1]),
-                                ))]
-                              )
-
-    if direction == "up":
-        '''
-         ______________
-        |  search area |
-        ++++++++++++++++
-        +              +
-        +  image box   +
-        +              +
-        +              +
-        ++++++++++++++++
-
-        '''
-        search_area = Polygon([
-                              # bottom
-                              # coodinates [x, y, x, y]
-                              (image_coords[0], image_coords[1] + height),
-                              (image_coords[2], image_coords[1] + height),
-                              # top:
-                              (image_coords[2], image_coords[3] +
-                               offset_distance),
-                              (image_coords[0], image_coords[3] +
-                               offset_distance),
-                              (image_coords[0], image_coords[1] + height)
-                              ])
-
-    if direction == "down":
-        '''
-        ++++++++++++++++
-        +              +
-        + image bbox   +
-        +              +
-        +              +
-        ++++++++++++++++
-        |_search_area__|
-
-        '''
-        search_area = Polygon([
-                              # bottom
-                              # coodinates [x, y, x, y]
-                              (image_coords[0], image_coords[1]),
-                              (image_coords[2], image_coords[3] - height),
-                              # top:
-                              (image_coords[2], image_coords[3] -
-                               height - offset_distance),
-                              (image_coords[0], image_coords[1] -
-                               offset_distance),
-                              (image_coords[0], image_coords[1])
-                              ])
-
-    if direction == "right":
-        '''
-        ++++++++++++++++ --
-        +              + s |
-        + image bbox   + e |
-        +              + a |
-        +              + r |
-        ++++++++++++++++ --
-
-        '''
-        search_area = Polygon([
-                              # bottom
-                              (image_coords[0] + width, image_coords[1]),
-                              (image_coords[2] + width + offset_distance,
-                               image_coords[1]),
-                              # top:
-                              (image_coords[2] + width + offset_distance,
-                               image_coords[3]),
-                              (image_coords[0] + width, image_coords[3]),
-                              (image_coords[0] + width, image_coords[1]),
-                              ])
-
-    if direction == "left":
-        '''
-         -- ++++++++++++++++
-        | s +              +
-        | e + image bbox   +
-        | a +              +
-        | r +              +
-         -- ++++++++++++++++
-
-        '''
-        search_area = Polygon((
-                              # bottom
-                              (image_coords[0] - offset_distance,
-                               image_coords[1]),
-                              (image_coords[2] - width, image_coords[1]),
-                              # top:
-                              (image_coords[2] - width, image_coords[3]),
-                              (image_coords[0] - offset_distance,
-                               image_coords[3]),
-                              (image_coords[0] - offset_distance,
-                               image_coords[1])
-                              ))
-
-    if direction == "down-right":
-        '''
-        ++++++++++++++++---
-        +              +  |
-        + image bbox   +  |
-        +              +  |
-        +              +  |
-        ++++++++++++++++  |
-        |__search_area____|
-
-        '''
-        search_area = Polygon((
-                            # bottom
-                            # coodinates [x, y, x, y]
-                            (image_coords[0], image_coords[1] -
-                             offset_distance),
-                            (image_coords[2] + offset_distance,
-                             image_coords[1] - offset_distance),
-                            # top:
-                            (image_coords[2] + offset_distance,
-                             image_coords[3]),
-                            (image_coords[2], image_coords[3]),
-                            (image_coords[2], image_coords[3] - height),
-                            (image_coords[0], image_coords[3] - height),
-                            (image_coords[0], image_coords[1] -
-                             offset_distance)
-        ))
-
-    if direction == "up-left":
-
-        '''
-          _________________
-         |   search area   |
-         |  ++++++++++++++++
-         |  +              +
-         |  + image bbox   +
-         |  +              +
-         |  +              +
-         ---++++++++++++++++
-
-        '''
-        search_area = Polygon((
-                            # bottom
-                            # coodinates [x, y, x, y]
-                            (image_coords[0] - offset_distance,
-                             image_coords[1]),
-                            (image_coords[0], image_coords[1]),
-                            (image_coords[2] - width, image_coords[3]),
-                            (image_coords[2], image_coords[3]),
-                            (image_coords[2], image_coords[3] +
-                             offset_distance),
-                            (image_coords[0] - offset_distance,
-                             image_coords[3] + offset_distance),
-                            (image_coords[0] - offset_distance,
-                             image_coords[1]),
-        ))
-
-    text_bbox = Polygon([
-                            (text_coords[0], text_coords[1]),
-                            (text_coords[2], text_coords[1]),
-                            (text_coords[2], text_coords[3]),
-                            (text_coords[0], text_coords[3]),
-                            (text_coords[0], text_coords[1])
-                    ])
-
-    if search_area.intersects(text_bbox):
-        return text_object
-    else:
-        return False
+    Parameters
+    ----------
+    text_objects: List[LTTextContainer | BoundingBox]
+        text elements to be indexed.
+
+    Returns
+    -------
+    STRtree
+        Spatial index of the text bounding boxes. The position of each box
+        in the index is the position of the text element in text_objects.
+
+    Raises
+    ------
+    TypeError
+        if the units of a bounding box are not supported.
+    """
+
+    return STRtree([shapely.box(*_text_coords(text)[:4])
+                    for text in text_objects])
+
+
+def find_captions_by_index(image_object: LTImage | BoundingBox,
+                           text_index: STRtree,
+                           text_objects: List[LTTextContainer | BoundingBox],
+                           offset: Offset, direction: Optional[str] = None
+                           ) -> List[LTTextContainer | BoundingBox]:
+    """
+    Finds the text elements within a certain distance (offset) from the
+    bounding box of an image using a spatial index of the text elements.
+    Only text elements whose bounding boxes intersect the search area are
+    visited, instead of comparing the image with every text element.
+
+    Parameters
+    ----------
+    image_object: LTImage | BoundingBox
+        Image whose bounding box will be used as reference.
+    text_index: STRtree
+        Spatial index of the text elements as returned by
+        ``build_text_index``.
+    text_objects: List[LTTextContainer | BoundingBox]
+        text elements used to build the index, in the same order.
+    offset: OffsetDistance object
+        distance from image within which the text elements will be searched.
+    direction: str
+        the directions the offeset will be applied around the image bounding
+        box. See ``find_caption_by_distance`` for possible values.
+
+    Returns
+    -------
+    List[LTTextContainer | BoundingBox]
+        text elements within offset distance, in the same order as in
+        text_objects.
+
+    Raises
+    ------
+    ValueError
+        if direction is not one of the following: right, left, down, up,
+        right-down, left-up, all
+    TypeError
+        if the units of a bounding box are not supported.
+    """
+
+    search_areas, image_hole = _search_areas(image_object, offset, direction)
+
+    candidates = set()
+    for area in search_areas:
+        candidates.update(text_index.query(shapely.box(*area),
+                                           predicate="intersects").tolist())
+
+    matches = []
+    for index in sorted(candidates):
+        text_coords = text_index.geometries[index].bounds
+        # text elements that lay strictly inside the image are not matched
+        if image_hole is not None and (
+                text_coords[0] > image_hole[0] and
+                text_coords[2] < image_hole[2] and
+                text_coords[1] > image_hole[1] and
+                text_coords[3] < image_hole[3]):
+            continue
+        matches.append(text_objects[index])
+
+    return matches
 
 
 if __name__ == '__main__':
@@ -4,7 +4,10 @@ import os
 import typer
 from tqdm import tqdm
 from typing_extensions import Annotated
-from visarchpy.dino.transformer import transform_to_dinov2, save_csv_dinov2, save_pickle_dinov2
+
+# The transformer module imports torch and transformers, which take
+# seconds to load. It is imported by the commands that use it, so other
+# visarch commands start without loading them.
 
 app = typer.Typer(help="Transforms images into visual features using DinoV2.",
     context_settings={"help_option_names": ["-h", "--help"]},
@@ -15,19 +18,27 @@ def from_file(
     file: str = typer.Argument(help="Path to image file"),
     output: Annotated[str, typer.Argument(help="Path to output directory")] = './dinov2',
     model: Annotated[str, typer.Argument(help="pretrained model to be used")] = 'facebook/dinov2-small',
-    pickle: Annotated[bool, typer.Option(help="Save all model features as pickle file", is_flag=True)] = True
+    pickle: Annotated[bool, typer.Option(help="Save all model features as pickle file", is_flag=True)] = True,
+    csv: Annotated[bool, typer.Option(help="Save features as CSV file instead of NPY file", is_flag=True)] = False,
+    half: Annotated[bool, typer.Option(help="Save NPY and pickle files in half precision (float16)", is_flag=True)] = False
         ) -> None:
-    
+    from visarchpy.dino.transformer import (transform_to_dinov2,
+                                            save_csv_dinov2, save_npy_dinov2,
+                                            save_pickle_dinov2)
+
     os.makedirs(output, exist_ok=True)
     filename = os.path.basename(file).split('.')[0]
 
     # extract features
     results = transform_to_dinov2(file, model)
-    save_csv_dinov2(os.path.join(output, filename + '.csv'), results['tensor'])
+    if csv:
+        save_csv_dinov2(os.path.join(output, filename + '.csv'), results['tensor'])
+    else:
+        save_npy_dinov2(os.path.join(output, filename + '.npy'), results['tensor'], half=half)
     
     # save pickle file
     if pickle:
-        save_pickle_dinov2(os.path.join(output, filename + '.pickle'), results['object'])
+        save_pickle_dinov2(os.path.join(output, filename + '.pickle'), results['object'], half=half)
 
     return None
 
@@ -36,34 +47,62 @@ def from_dir(
     directory: str = typer.Argument(help="Path to directory containing image files"),
     output: Annotated[str, typer.Argument(help="Path to parent output directory.")] = './dinov2',
     model: Annotated[str, typer.Argument(help="pretrained model to be used")] = 'facebook/dinov2-small',
-    pickle: Annotated[bool, typer.Option(help="Save all model features as pickle file", is_flag=True)] = True
+    pickle: Annotated[bool, typer.Option(help="Save all model features as pickle file", is_flag=True)] = True,
+    csv: Annotated[bool, typer.Option(help="Save features as CSV file instead of NPY file", is_flag=True)] = False,
+    half: Annotated[bool, typer.Option(help="Save NPY and pickle files in half precision (float16)", is_flag=True)] = False,
+    batch_size: Annotated[int, typer.Option(help="Number of images passed to the model at once")] = 32,
+    workers: Annotated[int, typer.Option(help="Number of processes used to load images")] = 4,
+    compile: Annotated[bool, typer.Option(help="Compile the model before extracting features", is_flag=True)] = False,
+    precision: Annotated[str, typer.Option(help="Reduced precision for inference: bfloat16 or float16")] = None,
+    slice_size: Annotated[int, typer.Option(help="Maximum number of images per forward pass. Lower values reduce memory use")] = None
         ) -> None:
-    
+    from visarchpy.dino.transformer import (transform_to_dinov2_batch,
+                                            save_csv_dinov2, save_npy_dinov2,
+                                            save_pickle_dinov2)
+
     # results will be saved in a subdirectory named after the input directory
     # and with the output directory as parent directory
 
     output_dir = os.path.join(output, os.path.basename(directory.rstrip('/')))
     os.makedirs(output_dir, exist_ok=True)
-    files = os.listdir(directory)
+    files = [os.path.join(directory, file) for file in os.listdir(directory)]
 
-    for file in tqdm(files, desc="Extracting features", unit="images"):
+    batches = transform_to_dinov2_batch(files, model, batch_size=batch_size,
+                                        num_workers=workers, compile=compile,
+                                        precision=precision,
+                                        slice_size=slice_size)
+    for file, results in tqdm(batches, total=len(files),
+                              desc="Extracting features", unit="images"):
         filename = os.path.basename(file).split('.')[0]
 
-        # extract features
-        try:
-            results = transform_to_dinov2(os.path.join(directory, file), model)
-        except IOError:
-            print(f"WARNING: Directory contain file(s) that are not images: {file}. Skipping...")
+        if results is None:
+            print(f"WARNING: Directory contain file(s) that are not images: {os.path.basename(file)}. Skipping...")
             continue
             # TODO: improve error handling for CLI
         else:
-            save_csv_dinov2(os.path.join(output_dir, filename + '.csv'), results['tensor'])
+            if csv:
+                save_csv_dinov2(os.path.join(output_dir, filename + '.csv'), results['tensor'])
+            else:
+                save_npy_dinov2(os.path.join(output_dir, filename + '.npy'), results['tensor'], half=half)
         
             # save pickle file
             if pickle:
-                save_pickle_dinov2(os.path.join(output_dir, filename + '.pickle'), results['object'])
+                save_pickle_dinov2(os.path.join(output_dir, filename + '.pickle'), results['object'], half=half)
     
     return None
 
+@app.command(help="Export a pretrained model to an ONNX file.")
+def export_onnx(
+    output: Annotated[str, typer.Argument(help="Path to ONNX file")] = './dinov2/dinov2.onnx',
+    model: Annotated[str, typer.Argument(help="pretrained model to be used")] = 'facebook/dinov2-small',
+    opset: Annotated[int, typer.Option(help="ONNX opset version")] = 17
+        ) -> None:
+    from visarchpy.dino.transformer import export_dinov2_onnx
+
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    export_dinov2_onnx(output, model, opset=opset)
+
+    return None
+
 if __name__ == "__main__":
     app()
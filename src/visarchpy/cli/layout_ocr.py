@@ -56,7 +56,9 @@ def from_dir(
     settings: Annotated[str, typer.Option(help="Path to pipeline JSON setting file. If None default settings are used. Use: [COMMAND] settings, to see current settings.")] = None,
     mods: Annotated[str, typer.Option(help="Path to MODS file. If None, metadata extraction will be skiped.")] = None,
     tmp: Annotated[str, typer.Option(help="If provided, PDF files in the data directory will be copied to this directory.")
-    ] = None) -> None:
+    ] = None,
+    workers: Annotated[int, typer.Option(help="Number of processes used to process PDF files in parallel.")] = 1
+    ) -> None:
     
     if settings is None:
         settings = default_settings.init()
@@ -67,7 +69,8 @@ def from_dir(
 
     pipeline = LayoutOCR(data_directory, output_directory,
                              settings=settings, metadata_file=mods,
-                             temp_directory=tmp, ignore_id=True)
+                             temp_directory=tmp, ignore_id=True,
+                             workers=workers)
 
     pipeline.run()
 
@@ -84,7 +87,9 @@ def batch(entry_range: str = typer.Argument(help="Range of entries to process, e
           output_directory: str = typer.Argument(help="path to directory where results will be saved."),
           settings: Annotated[str, typer.Option(help="path to pipeline JSON setting file. If None default settings are used. Use: [COMMAND] settings, to see current settings.")] = None,
           tmp: Annotated[str, typer.Option(help="If provided, PDF files in the data directory will be copied to this directory.")
-            ] = None) -> None:
+            ] = None,
+          workers: Annotated[int, typer.Option(help="Number of processes used to process the PDF files of an entry in parallel.")] = 1
+          ) -> None:
     """Extracts metadata from MODS files and images from PDF files
       using layout and OCR pipeline"""
 
@@ -104,7 +109,7 @@ def batch(entry_range: str = typer.Argument(help="Range of entries to process, e
 
         pipeline = LayoutOCR(data_directory, output_directory,
                              settings=settings, metadata_file=MODS_FILE,
-                             temp_directory=tmp)
+                             temp_directory=tmp, workers=workers)
 
         pipeline.run()
 
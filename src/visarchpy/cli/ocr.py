@@ -57,7 +57,9 @@ def from_dir(
     settings: Annotated[str, typer.Option(help="Path to pipeline JSON setting file. If None default settings are used. Use: [COMMAND] settings, to see current settings.")] = None,
     mods: Annotated[str, typer.Option(help="Path to MODS file. If None, metadata extraction will be skiped.")] = None,
     tmp: Annotated[str, typer.Option(help="If provided, PDF files in the data directory will be copied to this directory.")
-    ] = None) -> None:
+    ] = None,
+    workers: Annotated[int, typer.Option(help="Number of processes used to process PDF files in parallel.")] = 1
+    ) -> None:
     
     if settings is None:
         settings = default_settings.init()
@@ -68,7 +70,8 @@ def from_dir(
 
     pipeline = OCR(data_directory, output_directory,
                              settings=settings, metadata_file=mods,
-                             temp_directory=tmp, ignore_id=True)
+                             temp_directory=tmp, ignore_id=True,
+                             workers=workers)
 
     pipeline.run()
 
@@ -7,19 +7,26 @@ package.
 
 import torch
 import pickle
-import pandas as pd
+import zipfile
+from contextlib import contextmanager
+from functools import lru_cache
+import numpy as np
 from torch import Tensor
-from typing import Dict
+from typing import Dict, Iterator, List, Tuple
+from torch.utils.data import Dataset, DataLoader
 from transformers import AutoImageProcessor, AutoModel
 from transformers.modeling_outputs import BaseModelOutputWithPooling 
 from PIL import Image, UnidentifiedImageError
 
 
 def save_pickle_dinov2(pickle_filename: str,
-                       model_outputs: BaseModelOutputWithPooling
+                       model_outputs: BaseModelOutputWithPooling,
+                       half: bool = False
                        ) -> None:
     """
-    Save outputs of dinov2 model to a file.
+    Save outputs of dinov2 model to a file. Only the tensors in the outputs
+    are saved using ``torch.save``, which writes the tensor storages directly
+    instead of pickling the full Python object graph of the model outputs.
 
     Parameters
     ----------
@@ -29,6 +36,9 @@ def save_pickle_dinov2(pickle_filename: str,
         Pickle file with outputs object of dinov2 model. File willl be saved
         to the same directory as the image file, and with the same name as the
         image file.
+    half : bool
+        If True, tensors are saved in half precision (float16), which halves
+        the size of the file. Default is False.
 
     Returns
     -------
@@ -39,9 +49,14 @@ def save_pickle_dinov2(pickle_filename: str,
         raise TypeError("outputs must be a BaseModelOutputWithPooling object\
                         generated by the transfomers package. \
                         Got {type(outputs)}")
-    
-    with open(pickle_filename, 'wb') as f:
-        pickle.dump(model_outputs, f)
+
+    tensors = {key: value.detach().cpu().contiguous()
+               for key, value in model_outputs.items()
+               if torch.is_tensor(value)}
+    if half:
+        tensors = {key: value.half() for key, value in tensors.items()}
+
+    torch.save(tensors, pickle_filename)
 
     return None
 
@@ -62,10 +77,59 @@ def load_pickle_dinov2(pickle_filename: str) -> BaseModelOutputWithPooling:
         classes. A Python object.
     """
 
+    if zipfile.is_zipfile(pickle_filename):
+        tensors = torch.load(pickle_filename, weights_only=True)
+        return BaseModelOutputWithPooling(**tensors)
+
+    # files saved by older versions are plain pickle files
+    # with the full outputs object
     with open(pickle_filename, 'rb') as f:
-        content = pickle.load(f)
+        return pickle.load(f)
+
+
+def save_npy_dinov2(npy_filename: str, tensor: Tensor,
+                    half: bool = False) -> None:
+    """
+    Save pytorch tensor (2D) to a NumPy binary file (.npy). The tensor buffer
+    is written directly to disk, which is faster and produces smaller files
+    than saving to CSV.
+
+    Parameters
+    ----------
+    npy_filename : str
+        Path to npy file
+    tensor : Tensor
+        2D tensor to be saved to npy file.
+    half : bool
+        If True, the tensor is saved in half precision (float16), which
+        halves the size of the file. Default is False.
+
+    Returns
+    -------
+    None
+
+    Raises
+    ------
+    TypeError
+        If tensor is not a pytorch Tensor object.
+    ValueError
+        If tensor is not a 2D pytorch Tensor object.
+    """
+
+    if not isinstance(tensor, Tensor):
+        raise TypeError("tensor must be a pytorch Tensor object. \
+                        Got {type(tensor)}")
+
+    if tensor.ndim != 2:
+        raise ValueError("tensor must be a 2D pytorch Tensor object. \
+                        Got {tensor.ndim}")
+
+    array = tensor.detach().cpu().contiguous().numpy()
+    if half:
+        array = array.astype(np.float16)
+    np.save(npy_filename, array)
 
-    return content
+    return None
 
 
 def save_csv_dinov2(csv_filename: str, tensor: Tensor) -> None:
@@ -99,16 +163,51 @@ def save_csv_dinov2(csv_filename: str, tensor: Tensor) -> None:
         raise ValueError("tensor must be a 2D pytorch Tensor object. \
                         Got {tensor.ndim}")
 
+    # pandas is only imported when a CSV file is written, importing this
+    # module doesn't pay for it
+    import pandas as pd
+
     # convert tensor to pandas dataframe
-    df = pd.DataFrame(tensor.detach().numpy())
+    df = pd.DataFrame(tensor.detach().cpu().numpy())
     # save to csv file
     df.to_csv(csv_filename, sep=',', index=False, encoding='utf-8')
 
     return None
 
 
+@lru_cache(maxsize=4)
+def _load_dinov2(model_name: str) -> Tuple[AutoImageProcessor, AutoModel]:
+    """Loads the image processor and the model of a pretrained DINOv2 model,
+    in evaluation mode and with PyTorch's fused scaled dot-product
+    attention when the installed transformers supports it. Loaded models
+    are cached per model name, so their weights are read from disk only
+    once."""
+
+    processor = AutoImageProcessor.from_pretrained(model_name)
+    try:
+        model = AutoModel.from_pretrained(model_name, torch_dtype="auto",
+                                          attn_implementation="sdpa")
+    except (ValueError, TypeError):
+        # older transformers releases don't accept attn_implementation,
+        # or have no SDPA attention for DINOv2. Their default (eager)
+        # attention is used instead
+        model = AutoModel.from_pretrained(model_name, torch_dtype="auto")
+    return processor, model.eval()
+
+
+@lru_cache(maxsize=4)
+def _compile_dinov2(model: AutoModel) -> torch.nn.Module:
+    """Compiles a DINOv2 model with ``torch.compile``. Compiled models are
+    cached per model, so later calls reuse them and their compiled
+    graphs."""
+
+    return torch.compile(model, mode='reduce-overhead')
+
+
 def transform_to_dinov2(image_file: str,
-                        model_name: str = 'facebook/dinov2-small'
+                        model_name: str = 'facebook/dinov2-small',
+                        processor: AutoImageProcessor = None,
+                        model: AutoModel = None
                         ) -> Dict[Tensor, BaseModelOutputWithPooling]:
     """
     Extract features from an image using DINOv2 model.
@@ -119,31 +218,402 @@ def transform_to_dinov2(image_file: str,
         Path to image file.
     model_name : str
         pretrained DINOv2 model name (e.g. 'facebook/dinov2-small')
+    processor : AutoImageProcessor
+        Preloaded image processor. If None, the processor of `model_name` is
+        loaded once and reused by later calls.
+    model : AutoModel
+        Preloaded model, in evaluation mode. If None, the model `model_name`
+        is loaded once and reused by later calls.
 
     Returns
     -------
     results : Dict
         Last hidden state of DINOv2 model as squeezed tensor, and model
         outputs object.
+
+    Raises
+    ------
+    IOError
+        If the file is not a valid image.
     """
 
-    try:
-        image = Image.open(image_file)
-    except UnidentifiedImageError:
+    _, results = next(transform_to_dinov2_batch([image_file], model_name,
+                                                batch_size=1,
+                                                processor=processor,
+                                                model=model))
+    if results is None:
         raise IOError(f"Invialid image file: {image_file}")
 
-    processor = AutoImageProcessor.from_pretrained(model_name)
-    model = AutoModel.from_pretrained(model_name)
+    return results
 
-    inputs = processor(images=image, return_tensors="pt")
-    outputs = model(**inputs)
 
-    output_tensor = outputs.last_hidden_state
+class _DinoV2OnnxWrapper(torch.nn.Module):
+    """Returns the outputs of a DINOv2 model as a tuple of tensors, which is
+    the form expected by the ONNX exporter."""
 
-    # remove dimensions of size 1, i.e. squeeze tensor
-    squeezed_tensor = torch.squeeze(output_tensor)
+    def __init__(self, model: AutoModel):
+        super().__init__()
+        self.model = model
 
-    results = {'tensor': squeezed_tensor,
-               'object': outputs}
+    def forward(self, pixel_values: Tensor) -> Tuple[Tensor, Tensor]:
+        outputs = self.model(pixel_values=pixel_values)
+        return outputs.last_hidden_state, outputs.pooler_output
 
-    return results
+
+def export_dinov2_onnx(onnx_filename: str,
+                       model_name: str = 'facebook/dinov2-small',
+                       opset: int = 17) -> None:
+    """
+    Exports a pretrained DINOv2 model to an ONNX file. The batch dimension of
+    the exported model is dynamic. The ONNX file can be run with ONNX Runtime
+    or compiled into an engine with TensorRT (e.g. ``trtexec --onnx=<file>
+    --bf16``).
+
+    Parameters
+    ----------
+    onnx_filename : str
+        Path to ONNX file.
+    model_name : str
+        pretrained DINOv2 model name (e.g. 'facebook/dinov2-small')
+    opset : int
+        ONNX opset version. Default is 17.
+
+    Returns
+    -------
+    None
+    """
+
+    processor, model = _load_dinov2(model_name)
+    dummy_input = torch.zeros(1, 3, processor.crop_size['height'],
+                              processor.crop_size['width'],
+                              dtype=model.dtype, device=model.device)
+
+    torch.onnx.export(_DinoV2OnnxWrapper(model).eval(), (dummy_input,),
+                      onnx_filename,
+                      opset_version=opset,
+                      input_names=['pixel_values'],
+                      output_names=['last_hidden_state', 'pooler_output'],
+                      dynamic_axes={'pixel_values': {0: 'batch'},
+                                    'last_hidden_state': {0: 'batch'},
+                                    'pooler_output': {0: 'batch'}})
+
+    return None
+
+
+class _DinoV2Transform:
+    """
+    Preprocesses images in the same way as the image processor of DINOv2
+    (resize shortest edge, center crop, rescale and normalize), using only
+    Pillow and NumPy. This avoids the per-image configuration overhead of the
+    image processor.
+
+    Parameters
+    ----------
+    processor : AutoImageProcessor
+        Image processor of the pretrained DINOv2 model.
+    """
+
+    def __init__(self, processor: AutoImageProcessor):
+        self.shortest_edge = processor.size['shortest_edge']
+        self.crop_height = processor.crop_size['height']
+        self.crop_width = processor.crop_size['width']
+        self.resample = processor.resample
+        self.scale = np.float32(processor.rescale_factor)
+        self.mean = np.array(processor.image_mean, dtype=np.float32)
+        self.std = np.array(processor.image_std, dtype=np.float32)
+
+    @staticmethod
+    def supports(processor: AutoImageProcessor) -> bool:
+        """Checks the processor configuration can be reproduced."""
+
+        return bool(getattr(processor, 'do_resize', False) and
+                    getattr(processor, 'do_center_crop', False) and
+                    getattr(processor, 'do_rescale', False) and
+                    getattr(processor, 'do_normalize', False) and
+                    'shortest_edge' in processor.size and
+                    processor.size['shortest_edge'] is not None)
+
+    def __call__(self, image: Image.Image) -> np.ndarray:
+        width, height = image.size
+        short, long = (width, height) if width <= height else (height, width)
+        new_long = int(self.shortest_edge * long / short)
+        if width <= height:
+            new_size = (self.shortest_edge, new_long)
+        else:
+            new_size = (new_long, self.shortest_edge)
+        image = image.resize(new_size, resample=self.resample)
+
+        top = int((new_size[1] - self.crop_height) / 2)
+        left = int((new_size[0] - self.crop_width) / 2)
+        image = image.crop((left, top, left + self.crop_width,
+                            top + self.crop_height))
+
+        pixels = np.asarray(image, dtype=np.float32) * self.scale
+        pixels = (pixels - self.mean) / self.std
+
+        return np.ascontiguousarray(pixels.transpose(2, 0, 1))
+
+
+class DinoV2ImageDataset(Dataset):
+    """
+    Dataset of image files preprocessed for the DINOv2 model. Images are
+    decoded and preprocessed when an item is requested, which allows the
+    work to be distributed across the worker processes of a DataLoader.
+    Large JPEG images are decoded at a reduced scale, keeping both sides
+    at least twice the size the model resizes them to.
+
+    Parameters
+    ----------
+    image_files : List[str]
+        Paths to image files.
+    processor : AutoImageProcessor
+        Image processor of the pretrained DINOv2 model.
+    """
+
+    def __init__(self, image_files: List[str], processor: AutoImageProcessor):
+        self.image_files = image_files
+        self.processor = processor
+        self.transform = _DinoV2Transform(processor) \
+            if _DinoV2Transform.supports(processor) else None
+        shortest_edge = processor.size['shortest_edge'] \
+            if 'shortest_edge' in processor.size else None
+        self.draft_size = (2 * shortest_edge, 2 * shortest_edge) \
+            if shortest_edge else None
+
+    def __len__(self) -> int:
+        return len(self.image_files)
+
+    def __getitem__(self, index: int) -> Tuple[str, Tensor | None]:
+        image_file = self.image_files[index]
+        try:
+            image = Image.open(image_file)
+            if self.draft_size is not None:
+                # JPEG images are scaled down while decoding
+                image.draft('RGB', self.draft_size)
+            image = image.convert('RGB')
+        except (UnidentifiedImageError, IsADirectoryError):
+            # invalid images are reported by the caller
+            return image_file, None
+
+        if self.transform is not None:
+            return image_file, torch.from_numpy(self.transform(image))
+
+        inputs = self.processor(images=image, return_tensors="pt")
+        return image_file, inputs['pixel_values'][0]
+
+
+def _collate_dinov2(items: List[Tuple[str, Tensor | None]]
+                    ) -> Tuple[List[str], Tensor | None, List[str]]:
+    """Stacks pixel values of valid images in a batch, and keeps track of
+    invalid image files."""
+
+    files = [file for file, pixels in items if pixels is not None]
+    invalid = [file for file, pixels in items if pixels is None]
+    pixel_values = torch.stack(
+        [pixels for _, pixels in items if pixels is not None]
+        ) if files else None
+
+    return files, pixel_values, invalid
+
+
+@contextmanager
+def _float32_matmul_precision(precision: str | None) -> Iterator[None]:
+    """Sets the precision of float32 matrix products inside the context
+    (see ``torch.set_float32_matmul_precision``), and restores the previous
+    one on exit. Nothing is changed if precision is None."""
+
+    if precision is None:
+        yield
+        return
+    previous = torch.get_float32_matmul_precision()
+    torch.set_float32_matmul_precision(precision)
+    try:
+        yield
+    finally:
+        torch.set_float32_matmul_precision(previous)
+
+
+def _prefetch_to_device(loader: DataLoader, device: torch.device
+                        ) -> Iterator[Tuple[List[str], Tensor | None,
+                                            List[str]]]:
+    """Moves batches of a DataLoader to a device. On CUDA devices, the next
+    batch is copied on a separate stream while the current batch is being
+    processed."""
+
+    if device.type != 'cuda':
+        for files, pixel_values, invalid in loader:
+            if pixel_values is not None:
+                pixel_values = pixel_values.to(device)
+            yield files, pixel_values, invalid
+        return
+
+    copy_stream = torch.cuda.Stream(device)
+
+    def copy(batch):
+        files, pixel_values, invalid = batch
+        if pixel_values is not None:
+            with torch.cuda.stream(copy_stream):
+                pixel_values = pixel_values.to(device, non_blocking=True)
+        return files, pixel_values, invalid
+
+    batches = iter(loader)
+    next_batch = next(batches, None)
+    next_batch = copy(next_batch) if next_batch is not None else None
+    while next_batch is not None:
+        files, pixel_values, invalid = next_batch
+        current_stream = torch.cuda.current_stream(device)
+        current_stream.wait_stream(copy_stream)
+        if pixel_values is not None:
+            # memory must not be reused before the current stream is done
+            pixel_values.record_stream(current_stream)
+
+        # start copying the following batch before yielding this one
+        next_batch = next(batches, None)
+        next_batch = copy(next_batch) if next_batch is not None else None
+
+        yield files, pixel_values, invalid
+
+
+def transform_to_dinov2_batch(image_files: List[str],
+                              model_name: str = 'facebook/dinov2-small',
+                              batch_size: int = 32,
+                              num_workers: int = 0,
+                              device: str = None,
+                              compile: bool = False,
+                              precision: str = None,
+                              slice_size: int = None,
+                              processor: AutoImageProcessor = None,
+                              model: AutoModel = None
+                              ) -> Iterator[Tuple[str, Dict | None]]:
+    """
+    Extract features from several images using DINOv2 model. Images are
+    decoded and preprocessed by a DataLoader, and passed to the model in
+    batches.
+
+    Parameters
+    ----------
+    image_files : List[str]
+        Paths to image files.
+    model_name : str
+        pretrained DINOv2 model name (e.g. 'facebook/dinov2-small')
+    batch_size : int
+        Number of images passed to the model at once. Default is 32.
+    num_workers : int
+        Number of worker processes used to decode and preprocess images.
+        Default is 0, which preprocesses images in the main process.
+    device : str
+        Device used for inference (e.g. 'cpu', 'cuda'). If None, 'cuda' is
+        used when available, otherwise 'cpu'.
+    compile : bool
+        If True, the model is compiled with ``torch.compile`` before
+        inference. Compiled models are cached, and compilation takes place
+        on the first batch passed to them, so it pays off when many images
+        are processed. Smaller batches are padded to the size of a full one
+        (at most the number of images), so the compiled model is reused.
+        Default is False.
+    precision : str
+        Reduced precision used for inference, either 'bfloat16' or 'float16'.
+        On CUDA devices, the float32 matrix products left outside autocast
+        use TensorFloat-32 tensor cores. If None, inference runs in full
+        precision (float32). Features are always returned as float32 tensors.
+    slice_size : int
+        Maximum number of images passed to the model in a single forward
+        pass. Batches larger than this are split into slices, which bounds
+        the peak memory used by the model. If None, each batch is passed to
+        the model at once.
+    processor : AutoImageProcessor
+        Preloaded image processor. If None, the processor of `model_name` is
+        loaded once and reused by later calls.
+    model : AutoModel
+        Preloaded model, in evaluation mode. It is moved to `device`. If None,
+        the model `model_name` is loaded once and reused by later calls.
+
+    Yields
+    ------
+    Tuple[str, Dict | None]
+        Path to image file and results for that image in the same form
+        returned by ``transform_to_dinov2``. Results are None if the file is
+        not a valid image.
+
+    Raises
+    ------
+    ValueError
+        If precision is not one of 'bfloat16', 'float16', or None.
+    """
+
+    if precision not in ['bfloat16', 'float16', None]:
+        raise ValueError(f"precision must be either 'bfloat16', 'float16' or \
+                         None. Got {precision}")
+
+    if device is None:
+        device = 'cuda' if torch.cuda.is_available() else 'cpu'
+    device = torch.device(device)
+
+    if processor is None or model is None:
+        cached_processor, cached_model = _load_dinov2(model_name)
+        if processor is None:
+            processor = cached_processor
+        if model is None:
+            model = cached_model
+    model = model.to(device)
+    if compile:
+        model = _compile_dinov2(model)
+    # with reduced precision, TensorFloat-32 tensor cores are allowed for
+    # float32 matrix products. The caller's setting is restored after each
+    # batch
+    matmul_precision = 'high' \
+        if precision is not None and device.type == 'cuda' else None
+    # number of images per forward pass. It is never larger than the
+    # number of images, compiled models pad smaller slices to this size
+    pass_size = max(1, min(slice_size or batch_size, batch_size,
+                           len(image_files)))
+
+    loader_options = {}
+    if num_workers > 0:
+        loader_options['prefetch_factor'] = 4
+
+    loader = DataLoader(DinoV2ImageDataset(image_files, processor),
+                        batch_size=batch_size,
+                        num_workers=num_workers,
+                        collate_fn=_collate_dinov2,
+                        pin_memory=device.type == 'cuda',
+                        **loader_options)
+
+    for files, pixel_values, invalid in _prefetch_to_device(loader, device):
+        for file in invalid:
+            yield file, None
+
+        if pixel_values is None:
+            continue
+
+        with torch.inference_mode(), torch.autocast(
+                device_type=device.type,
+                dtype=getattr(torch, precision or 'bfloat16'),
+                enabled=precision is not None), \
+                _float32_matmul_precision(matmul_precision):
+            hidden_states = []
+            pooler_outputs = []
+            for pixel_slice in torch.split(pixel_values, pass_size):
+                count = len(pixel_slice)
+                if compile and count < pass_size:
+                    # a new input shape would trigger a recompilation
+                    padding = pixel_slice.new_zeros(
+                        (pass_size - count, *pixel_slice.shape[1:]))
+                    pixel_slice = torch.cat([pixel_slice, padding])
+                outputs = model(pixel_values=pixel_slice)
+                hidden_states.append(
+                    outputs.last_hidden_state[:count].float().cpu())
+                pooler_outputs.append(
+                    outputs.pooler_output[:count].float().cpu())
+
+        last_hidden_state = torch.cat(hidden_states)
+        pooler_output = torch.cat(pooler_outputs)
+
+        for index, file in enumerate(files):
+            # keep the batch dimension, as in single image outputs
+            image_outputs = BaseModelOutputWithPooling(
+                last_hidden_state=last_hidden_state[index:index + 1],
+                pooler_output=pooler_output[index:index + 1]
+                )
+            yield file, {'tensor': last_hidden_state[index],
+                         'object': image_outputs}
@@ -4,15 +4,19 @@ Author: M.G. Garcia
 """
 
 import os
+import sys
+import csv
 import uuid
 import pandas as pd
-import json
+import orjson
 import warnings
-from dataclasses import dataclass, field, asdict
+from functools import lru_cache
+from dataclasses import dataclass, field, fields, is_dataclass
 from typing import Optional, List
 from pymods import MODSReader
 
-@dataclass
+
+@dataclass(slots=True)
 class FilePath:
     """
     Represents a file path
@@ -54,7 +58,7 @@ class FilePath:
         return os.path.join(self.root_path, self.file_path)
 
 
-@dataclass
+@dataclass(slots=True)
 class Person:
     """
     Represents a person and its role
@@ -63,7 +67,7 @@ class Person:
     role: str
 
 
-@dataclass
+@dataclass(slots=True)
 class Department:
     """
     Represents a department in a Faculty
@@ -71,7 +75,7 @@ class Department:
     name: str
 
 
-@dataclass
+@dataclass(slots=True)
 class Faculty:
     """
     Represents a Faculty
@@ -80,7 +84,7 @@ class Faculty:
     departments: List[Department]
 
 
-@dataclass
+@dataclass(slots=True)
 class Document:
     """
     Represents a (PDF) document
@@ -93,7 +97,7 @@ class Document:
         self.location.update_root_path(path)
 
 
-@dataclass
+@dataclass(slots=True)
 class Visual:
     """A class for handling metadata of visuals (images)
     extracted from PDF files"""
@@ -102,7 +106,9 @@ class Visual:
     document_page: int  # page number in the document index
     bbox: List[int]  # bounding box of the visual in the document page
     bbox_units: str  # units of the bounding box
-    id: Optional[str] = field(init=False)  # unique identifier
+    # unique identifier, generated for each instance
+    id: Optional[str] = field(init=False,
+                              default_factory=lambda: str(uuid.uuid4()))
     # caption of the visual
     caption: Optional[list] = field(init=False, default=None)
     # one of: photo, drawing, map, etc.
@@ -110,9 +116,6 @@ class Visual:
     # location where the visual is stored
     location: FilePath = field(init=False, default=None)
 
-    def __post_init__(self):
-        self.id = str(uuid.uuid4())
-
     def set_visual_type(self, visual_type: str) -> None:
         """Sets the visual type. One of photo, drawing, map, etc.
 
@@ -125,7 +128,7 @@ class Visual:
         -------
         None
         """
-        self.visual_type = visual_type
+        self.visual_type = _intern_strings(visual_type)
 
     def set_caption(self, caption: str) -> None:
         """Sets the caption for the visual
@@ -257,22 +260,22 @@ class Metadata:
         self.title = metadata.get('title')
         self.abstract = metadata.get('abstract')
         self.submission_date = metadata.get('date')
-        self.thesis_type = metadata.get('genre')
-        self.subjects = metadata.get('subjects')
+        self.thesis_type = _intern_strings(metadata.get('genre'))
+        self.subjects = _intern_strings(metadata.get('subjects'))
         self.copyright = metadata.get('rights')
         self.languages = metadata.get('language')
 
         self.uuid = metadata.get('identifiers')
         self.iid = metadata.get('iid')
-        self.media_type = metadata.get('internet_media_type')
-        self.issuance = metadata.get('issuance')
-        self.digital_origin = metadata.get('digital_origin')
+        self.media_type = _intern_strings(metadata.get('internet_media_type'))
+        self.issuance = _intern_strings(metadata.get('issuance'))
+        self.digital_origin = _intern_strings(metadata.get('digital_origin'))
         self.doi = metadata.get('doi')
         self.edition = metadata.get('edition')
         self.extent = metadata.get('extent')
-        self.form = metadata.get('form')
+        self.form = _intern_strings(metadata.get('form'))
         self.classification = metadata.get('classification')
-        self.collection = metadata.get('collection')
+        self.collection = _intern_strings(metadata.get('collection'))
         self.geo_code = metadata.get('geo_code')
         self.corp_names = metadata.get('corp_names')
         self.creators = metadata.get('creators')
@@ -282,7 +285,7 @@ class Metadata:
         self.publication_place = metadata.get('publication_place')
         self.publisher = metadata.get('publisher')
         self.purl = metadata.get('purl')
-        self.type_resource = metadata.get('type_resource')
+        self.type_resource = _intern_strings(metadata.get('type_resource'))
 
     def add_document(self, document: Document) -> None:
         """ Adds a document object to the metadata
@@ -396,13 +399,65 @@ class Metadata:
         # update total number of visuals
         self.total_visuals += 1
 
+    def extend_visuals(self, visuals: List[Visual]) -> None:
+        """ Adds several visuals to the metadata at once
+
+        Parameters
+        ----------
+        visuals: List[Visual]
+            visual objects
+
+        Returns
+        -------
+        None
+
+        Raises
+        ------
+        TypeError
+            if an element of visuals is not a Visual object
+
+        """
+
+        if not all(isinstance(visual, Visual) for visual in visuals):
+            raise TypeError('visuals must be Visual objects')
+
+        if not visuals:
+            return None
+        if not self.visuals:
+            self.visuals = []
+        self.visuals.extend(visuals)
+
+        # update total number of visuals
+        self.total_visuals += len(visuals)
+
     def as_dict(self) -> dict:
         """ Returns metadata as a dictionary """
-        return asdict(self)
+        return _to_dict(self)
 
     def as_dataframe(self) -> pd.DataFrame:
         """ Returns metadata as a Pandas DataFrame """
-        return pd.DataFrame([self.as_dict()])
+        return Metadata.to_dataframe([self])
+
+    @classmethod
+    def to_dataframe(cls, records: List['Metadata']) -> pd.DataFrame:
+        """ Returns the metadata of several entries as a Pandas DataFrame,
+        with one row per entry. The DataFrame is built at once, instead of
+        concatenating one DataFrame per entry.
+
+        Parameters
+        ----------
+        records: List[Metadata]
+            metadata objects
+
+        Returns
+        -------
+        pd.DataFrame
+            metadata of the entries, in the same order as records
+        """
+
+        return pd.DataFrame.from_records(
+            [record.as_dict() for record in records],
+            columns=list(_field_names(cls)))
 
     def save_to_csv(self, filename: str) -> None:
         """ Writes metadata to a CSV file
@@ -418,10 +473,16 @@ class Metadata:
 
         """
 
-        self.as_dataframe().to_csv(filename, index=False)
+        # a single row is written, without building a DataFrame
+        metadata = self.as_dict()
+        with open(filename, 'w', newline='') as f:
+            writer = csv.writer(f, lineterminator=os.linesep)
+            writer.writerow(metadata.keys())
+            writer.writerow(metadata.values())
 
     def save_to_json(self, filename: str) -> None:
-        """ Writes metadata to a JSON file 
+        """ Writes metadata to a JSON file, indented with 2 spaces. NaN and
+        infinite values are written as null.
 
         Parameters
         ----------
@@ -433,8 +494,54 @@ class Metadata:
         None
         """
 
-        with open(filename, 'w') as f:
-            json.dump(self.as_dict(), f, indent=4)
+        # orjson reads non-slotted dataclasses from their __dict__, which
+        # misses fields left at their default value, so Metadata is
+        # converted with as_dict first. NumPy values and non-string keys
+        # are written as json.dump did
+        with open(filename, 'wb') as f:
+            f.write(orjson.dumps(self.as_dict(),
+                                 option=orjson.OPT_INDENT_2 |
+                                 orjson.OPT_SERIALIZE_NUMPY |
+                                 orjson.OPT_NON_STR_KEYS))
+
+
+@lru_cache(maxsize=None)
+def _field_names(cls: type) -> tuple:
+    """Returns the field names of a dataclass"""
+    return tuple(_field.name for _field in fields(cls))
+
+
+def _intern_strings(value: object) -> object:
+    """Interns a string, or the strings in a list. Metadata values such as
+    thesis types, roles and subjects repeat across entries, interned
+    values share a single string object."""
+
+    if isinstance(value, str):
+        return sys.intern(value)
+    if isinstance(value, list):
+        return [sys.intern(item) if isinstance(item, str) else item
+                for item in value]
+    return value
+
+
+def _to_dict(obj: object) -> object:
+    """Converts dataclasses to dictionaries of their fields, recursively,
+    like ``dataclasses.asdict``. Values that aren't dataclasses, lists,
+    tuples or dictionaries are not copied."""
+
+    obj_type = type(obj)
+    if obj is None or obj_type in (str, int, float, bool):
+        return obj
+    if is_dataclass(obj):
+        return {name: _to_dict(getattr(obj, name))
+                for name in _field_names(obj_type)}
+    if obj_type is list:
+        return [_to_dict(value) for value in obj]
+    if obj_type is tuple:
+        return tuple(_to_dict(value) for value in obj)
+    if obj_type is dict:
+        return {_to_dict(key): _to_dict(value) for key, value in obj.items()}
+    return obj
 
 
 def extract_mods_metadata(mods_file: str) -> dict:
@@ -498,7 +605,8 @@ def extract_mods_metadata(mods_file: str) -> dict:
         # Author and Mentor names as <surname>, <initials>
         persons = []
         # dictionary with fullname and role
-        [persons.append(Person(name=name.text, role=name.role.text)) for
+        [persons.append(Person(name=name.text,
+                               role=_intern_strings(name.role.text))) for
          name in record.names]
         meta["persons"] = persons
 
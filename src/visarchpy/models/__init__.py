@@ -2,7 +2,18 @@
 Loads pretrained models for its use in the VisArchPy package.
 """
 
+import os
 import pickle
+from functools import lru_cache
+
+
+@lru_cache(maxsize=None)
+def _load_model(file_name: str):
+    """Loads a pickled model from the models directory. Models are loaded
+    only once per session."""
+
+    with open(os.path.join(os.path.dirname(__file__), file_name), 'rb') as f:
+        return pickle.load(f)
 
 
 class KmeansBbox20:
@@ -12,10 +23,7 @@ class KmeansBbox20:
 
     def __init__(self):
 
-        with open('./src/visarchpy/models/kmeans_bbox20.pkl', 'rb') as f:
-            predictor = pickle.load(f)
-
-        self.predictor = predictor
+        self.predictor = _load_model('kmeans_bbox20.pkl')
 
     def __call__(self):
         return self.predictor
@@ -4,9 +4,11 @@ to PDF files.
 Author: Manuel Garcia
 """
 
+import os
 import itertools
 import pytesseract
 import copy
+from contextlib import contextmanager
 import matplotlib.pyplot as plt
 import matplotlib.patches as patches
 from bs4 import BeautifulSoup
@@ -14,6 +16,34 @@ from visarchpy.pdf import convert_pdf_to_image
 from PIL.Image import Image
 
 
+@contextmanager
+def limit_tesseract_threads(threads: int = 1):
+    """
+    Limits the number of OpenMP threads used by the Tesseract processes
+    started inside the context. Tesseract spends more time coordinating its
+    threads than it gains from them, so pages are better OCR'ed in parallel
+    with one thread each. A limit already set with the OMP_THREAD_LIMIT
+    environment variable is kept.
+
+    Parameters
+    ----------
+    threads: int
+        maximum number of threads for each Tesseract process. Default: 1.
+    """
+
+    # Tesseract runs in a child process that inherits the environment.
+    # The variable is removed on exit, so OpenMP libraries loaded later by
+    # this process (torch, BLAS) are not limited
+    if "OMP_THREAD_LIMIT" in os.environ:
+        yield
+        return
+    os.environ["OMP_THREAD_LIMIT"] = str(threads)
+    try:
+        yield
+    finally:
+        os.environ.pop("OMP_THREAD_LIMIT", None)
+
+
 def region_to_string(image: Image,
                      bbox: list[float],
                      config: str = '--oem 1 --psm 1') -> str:
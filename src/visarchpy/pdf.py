@@ -6,15 +6,18 @@ and returns the elements that are images, texts, and vectors (not implemented).
 Author: M.G. Garcia
 """
 
+import warnings
 from pdfminer.high_level import extract_pages
+from pdfminer.pdfpage import PDFPage
 from pdf2image import convert_from_path
-from typing import Any
+from functools import lru_cache
+from itertools import compress
+import numpy as np
+from typing import Any, Optional, Tuple
 
 from pdfminer.layout import (
     LTPage,
-    LTItem,
     LTTextBox,
-    LTText,
     LTContainer,
     LTImage,
     LTFigure,
@@ -22,6 +25,26 @@ from pdfminer.layout import (
 )
 
 
+@lru_cache(maxsize=None)
+def _element_kind(element_type: type) -> Tuple[Optional[str], bool]:
+    """Returns the group an element type is sorted into (texts, vectors,
+    images or None), and whether its children must be visited. Results are
+    cached per type, so the isinstance checks run once per layout class."""
+
+    if issubclass(element_type, LTTextBox):
+        # text lines and characters are never sorted, therefore the
+        # children of text boxes are not visited
+        return "texts", False
+
+    if issubclass(element_type, (LTFigure, LTCurve)):
+        kind = "vectors"
+    elif issubclass(element_type, LTImage):
+        kind = "images"
+    else:
+        kind = None
+    return kind, issubclass(element_type, LTContainer)
+
+
 def sort_layout_elements(
         page: LTPage,
         img_width: int = None,
@@ -40,7 +63,8 @@ def sort_layout_elements(
         None,  a value of 0 will be used
     img_height: int
         minimum height of image to be extracted. If
-        None, img_width will be used
+        None, img_width will be used. Images without a
+        width or height are kept, with a warning
 
     Returns
     -------
@@ -59,25 +83,39 @@ def sort_layout_elements(
     image_elements = []
     vector_elements = []
 
-    # From pdfminer six#
-    def render(item: LTItem) -> None:
-        if isinstance(item, LTContainer):
-            for child in item:
-                render(child)
-        elif isinstance(item, LTText):
-            pass
-        if isinstance(item, LTTextBox):
+    # Elements are visited depth-first with an explicit stack, which
+    # avoids a Python call per element and the recursion limit on deeply
+    # nested pages. Containers are sorted after their children.
+    stack = [(page, False)]
+    while stack:
+        item, expanded = stack.pop()
+        kind, descend = _element_kind(type(item))
+        if not expanded and descend:
+            stack.append((item, True))
+            stack.extend((child, False) for child in list(item)[::-1])
+            continue
+
+        if kind == "texts":
             text_elements.append(item)
-        elif isinstance(item, LTFigure) or isinstance(item, LTCurve):
+        elif kind == "vectors":
             vector_elements.append(item)
-        elif isinstance(item, LTImage):
-            x, y = item.srcsize[0], item.srcsize[1]
-            if x < img_width or y < img_height:
-                pass
-            else:
-                image_elements.append(item)
-
-    render(page)
+        elif kind == "images":
+            image_elements.append(item)
+
+    if image_elements:
+        # images smaller than the minimum size are removed at once
+        sizes = np.array([image.srcsize[:2] for image in image_elements],
+                         dtype=float)
+        keep = (sizes[:, 0] >= img_width) & (sizes[:, 1] >= img_height)
+        # images without a width or height can't be compared with the
+        # minimum size, they are kept
+        unknown = np.isnan(sizes).any(axis=1)
+        if unknown.any():
+            warnings.warn(f"{int(unknown.sum())} image(s) on page "
+                          f"{page_number} have no width or height, they "
+                          "are kept without checking their size")
+            keep |= unknown
+        image_elements = list(compress(image_elements, keep))
 
     return {"page_number": page_number, "texts": text_elements,
             "images": image_elements,
@@ -85,6 +123,26 @@ def sort_layout_elements(
 
 
 
+def count_pdf_pages(pdf_file: str) -> int:
+    """
+    Counts the pages of a PDF file. Only the page tree of the document is
+    read, the content of the pages is not parsed.
+
+    Parameters
+    ----------
+    pdf_file: str
+        path to PDF file
+
+    Returns
+    -------
+    int
+        number of pages in the PDF file
+    """
+
+    with open(pdf_file, 'rb') as file:
+        return sum(1 for _ in PDFPage.get_pages(file))
+
+
 def convert_pdf_to_image(pdf_file: str,
                          dpi: int = 200,
                          **kargs) -> list[Any]:
@@ -122,22 +180,21 @@ def convert_pdf_to_image(pdf_file: str,
 
 if __name__ == "__main__":
     
-    from visarchpy.captions import find_caption_by_distance
+    from visarchpy.captions import find_captions_by_distance, Offset
     # has 158283 figure elements
     pdf_3 = "data-pipelines/data/caption-tests/multi-image-caption.pdf"
 
     out_dir = "data-pipelines/img/pdfminer/"
 
-    pages = extract_pages(pdf_3)
-
-    for page in pages:
+    # texts and images are collected in a single pass over the PDF
+    for page in extract_pages(pdf_3):
         elements = sort_layout_elements(page, img_width=100, img_height=100)
-        # print(elements)
-        for img in elements["images"]:
-            for _text in elements["texts"]:
-                match = find_caption_by_distance(img, _text, offset_distance=10, direction="down")
-                if match:
-                    print(img, _text)
+        matches = find_captions_by_distance(elements["images"],
+                                            elements["texts"],
+                                            Offset(10, "px"),
+                                            direction="down")
+        for i, j in zip(*matches.nonzero()):
+            print(elements["images"][i], elements["texts"][j])
 
     PDF_FILE = 'tests/data/multi-image-caption.pdf'
     OUTPUT_DIR = 'tests/data'
@@ -9,16 +9,21 @@ import shutil
 import time
 import logging
 import json
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from logging import Logger
+from typing import Iterable, List, Optional, Tuple
 import visarchpy.ocr as ocr
 from pdfminer.high_level import extract_pages
 from pdfminer.image import ImageWriter
 from pdfminer.pdfparser import PDFSyntaxError
 from tqdm import tqdm
 from visarchpy.utils import create_output_dir
-from visarchpy.captions import find_caption_by_distance, find_caption_by_text
+from visarchpy.captions import (find_captions_by_distance,
+                                compile_caption_pattern,
+                                find_caption_by_pattern)
 from visarchpy.captions import BoundingBox
-from visarchpy.pdf import sort_layout_elements
+from visarchpy.pdf import sort_layout_elements, count_pdf_pages
 from visarchpy.metadata import Document, Metadata, Visual, FilePath, extract_mods_metadata
 from visarchpy.captions import Offset
 from pdfminer.pdftypes import PDFNotImplementedError
@@ -30,13 +35,19 @@ import PIL.Image
 PIL.Image.MAX_IMAGE_PIXELS = None
 
 
+# Number of pages parsed by a worker process at a time, when the layout
+# analysis of a PDF file runs in several processes
+PAGES_PER_TASK = 10
+
+
 # Common interface for all pipelines
 class Pipeline(ABC):
     """Abstract base class for all pipelines."""
 
     def __init__(self, data_directory: str, output_directory: str,
                  settings: dict = None, metadata_file: str = None,
-                 temp_directory: str = None, ignore_id: bool = False) -> None:
+                 temp_directory: str = None, ignore_id: bool = False,
+                 workers: int = 1) -> None:
         """"
         Parameters
         ----------
@@ -56,6 +67,9 @@ class Pipeline(ABC):
         ignore_id : bool
             If True, it won't filter PDF by ID (TU Delft dataset specific). Defaults to False.
             As a result, all PDF files in the data directory will be processed.
+        workers : int
+            Number of processes used to process PDF files in parallel.
+            Defaults to 1, which processes PDF files one after another.
 
         """
         self.data_directory = data_directory
@@ -64,6 +78,7 @@ class Pipeline(ABC):
         self.metadata_file = metadata_file
         self.temp_directory = temp_directory
         self.ignore_id = ignore_id
+        self.workers = workers
 
     @property
     def settings(self) -> dict:
@@ -111,6 +126,18 @@ class Pipeline(ABC):
         """
         self._ignore_id = ignore_id
 
+    @property
+    def workers(self) -> int:
+        """Gets the number of processes used to process PDF files.
+        """
+        return self._workers
+
+    @workers.setter
+    def workers(self, workers: int) -> None:
+        """Sets the number of processes used to process PDF files.
+        """
+        self._workers = workers
+
     @abstractmethod
     def run(self) -> dict:
         """Run the pipeline."""
@@ -126,6 +153,7 @@ def extract_visuals_by_layout(pdf: str, metadata: Metadata, data_dir: str,
                               output_dir: str, pdf_file_dir: str,
                               layout_settings: dict, logger: Logger,
                               entry_id: str = None,
+                              workers: int = 1
                               ) -> dict:
     """Extract visuals from a PDF file using layout analysis to
     a directory.
@@ -149,6 +177,11 @@ def extract_visuals_by_layout(pdf: str, metadata: Metadata, data_dir: str,
         Identifier of the entry being processed.
     layout_settings : dict
         A dictionary containing the settings for the layout analysis.
+    workers : int
+        Number of processes used for the layout analysis. Pages are split
+        in consecutive ranges of 10 pages, and each process parses the
+        ranges it is given. Default is 1, which analyses all pages in the
+        current process.
 
     Returns
     -------
@@ -161,6 +194,8 @@ def extract_visuals_by_layout(pdf: str, metadata: Metadata, data_dir: str,
         {'no_images_pages': <list of pages where no images were found>,
         "metadata": <Metadata object>}
         ```
+        Pages where no images were found are dictionaries with their page
+        number only: {"page_number": <int>}.
 
     Raises
     ------
@@ -203,94 +238,125 @@ def extract_visuals_by_layout(pdf: str, metadata: Metadata, data_dir: str,
     # returns a pathlib object
     image_directory = create_output_dir(entry_directory, pdf_file_dir)
     # PROCESS PDF
-    pdf_pages = extract_pages(pdf_document.location.full_path())
-    pages = []
-    no_image_pages = []  # collects pages where no images were found
-    # by layout analysis
-    # this checks for malformed or corrupted PDF files, and
-    # unsupported fonts and some bugs in pdfminer
+    args = (image_directory, output_dir, pdf_file_dir, pdf_document,
+            layout_settings, logger, entry_id)
+    page_ranges = []
+    if workers > 1:
+        try:
+            page_count = count_pdf_pages(pdf_document.location.full_path())
+        except PDFSyntaxError:
+            page_count = 0  # errors are logged by the layout analysis
+        page_ranges = [range(start, min(start + PAGES_PER_TASK, page_count))
+                       for start in range(0, page_count, PAGES_PER_TASK)]
+
+    if len(page_ranges) > 1:
+        # pdfminer objects can't be sent between processes, therefore
+        # each process parses its own range of pages
+        visuals = []
+        no_image_pages = []
+        with ProcessPoolExecutor(max_workers=min(workers, len(page_ranges))
+                                 ) as executor:
+            futures = [executor.submit(_extract_layout_pages, page_range,
+                                       *args)
+                       for page_range in page_ranges]
+            for future in futures:
+                range_visuals, range_pages = future.result()
+                visuals.extend(range_visuals)
+                no_image_pages.extend(range_pages)
+        for visual in visuals:
+            # visuals refer to a copy of the document after leaving
+            # the worker process
+            visual.document = pdf_document
+    else:
+        visuals, no_image_pages = _extract_layout_pages(None, *args)
 
-    try:
-        for page in tqdm(pdf_pages, desc="Sorting pages layout\
-                            analysis", unit="pages"):
-            elements = sort_layout_elements(
-                page,
-                img_width=layout_settings["layout"]["image"]["width"],
-                img_height=layout_settings["layout"]["image"]["height"]
-            )
-            pages.append(elements)
+    metadata.extend_visuals(visuals)
+    logger.info("Layout analysis of " + pdf_file_path + ": " +
+                str(len(visuals)) + " visuals, " + str(len(no_image_pages)) +
+                " pages without images")
 
-    except PDFSyntaxError:  # skip malformed or corrupted PDF files
-        logger.error("PDFSyntaxError. Couldn't read: "
-                     + pdf_document.location.file_path)
-        Warning("PDFSyntaxError. Couldn't read: " +
-                pdf_document.location.file_path)
-    except AssertionError as e:  # skip unsupported fonts
-        logger.error("AssertionError. Unsupported font: "
-                     + pdf_document.location.file_path + str(e))
-        Warning("AssertionError. Unsupported font: " +
-                pdf_document.location.file_path + str(e))
-    except TypeError as e:  # skip bug in pdfminer
-        # no_image_pages.append(page) # pass page to OCR analysis
-        logger.error("TypeError. Bug with Predictor: "
-                     + pdf_document.location.file_path + str(e))
-        Warning("TypeError. Bug with Predictor: " +
-                pdf_document.location.file_path + str(e))
-    else:
-        # TODO: test this only happnes when no exception is raised
-        del elements  # free memory
+    return {'no_images_pages': no_image_pages, "metadata": metadata}
+
+
+def _extract_layout_pages(page_numbers: Optional[Iterable[int]],
+                          image_directory: pathlib.Path, output_dir: str,
+                          pdf_file_dir: str, pdf_document: Document,
+                          layout_settings: dict, logger: Logger,
+                          entry_id: str) -> Tuple[List[Visual], List[dict]]:
+    """Extracts visuals from some pages of a PDF file using layout analysis.
+    See ``extract_visuals_by_layout`` for the parameters. `page_numbers`
+    are zero-based page indices, all pages are analysed if None.
+
+    Returns
+    -------
+    Tuple[List[Visual], List[dict]]
+        The visuals extracted from the pages, and the page numbers of the
+        pages where no images were found.
+    """
+
+    # PROCESS PDF
+    # pages are sorted and analysed one at a time, only the page being
+    # analysed is kept in memory
+    pages = _sort_pages(page_numbers, pdf_document, layout_settings, logger)
+    visuals = []
+    no_image_pages = []  # collects pages where no images were found
+    # by layout analysis
 
     layout_offset_dist = Offset(layout_settings["layout"]["caption"]
                                 ["offset"][0],
                                 layout_settings["layout"]["caption"]
                                 ["offset"][1])
     
-    # PROCESS PAGE USING LAYOUT ANALYSIS
-    for page in tqdm(pages,
-                     desc="layout analysis", total=len(pages),
-                     unit="sorted pages"):
+    caption_pattern = compile_caption_pattern(
+        layout_settings["layout"]["caption"]["keywords"])
+    caption_direction = layout_settings["layout"]["caption"]["direction"]
+
+    # one writer for all pages, images are saved to the same directory
+    iw = ImageWriter(image_directory)
+    # file names of the image streams already saved, by object id.
+    # Streams referenced several times are saved only once
+    exported_streams = {}
+    # location of saved images, relative to the output directory
+    location_prefix = f'{entry_id}/{pdf_file_dir}/'
 
-        iw = ImageWriter(image_directory)
+    # PROCESS PAGE USING LAYOUT ANALYSIS
+    for page in pages:
 
         if page["images"] == []:  # collects pages where no images
             # were found by layout analysis # TODO: fix this
-            no_image_pages.append(page)
-        for img in page["images"]:
+            no_image_pages.append({"page_number": page["page_number"]})
+            continue
+        # images are renamed to include the entry id and page number
+        image_name_prefix = f'{entry_id}-page{page["page_number"]}-'
+        # Search for captions using proximity to images
+        # This may generate multiple matches per image
+        caption_matches = find_captions_by_distance(
+            page["images"],
+            page["texts"],
+            offset=layout_offset_dist,
+            direction=caption_direction
+            )
+        for img, text_matches in zip(page["images"], caption_matches):
             visual = Visual(document_page=page["page_number"],
                             document=pdf_document,
                             bbox=img.bbox, bbox_units="pt")
-            # Search for captions using proximity to image
-            # This may generate multiple matches
-            bbox_matches = []
-            for _text in page["texts"]:
-                match = find_caption_by_distance(
-                    img,
-                    _text,
-                    offset=layout_offset_dist,
-                    direction=layout_settings["layout"]["caption"]["direction"]
-                    )
-                if match:
-                    bbox_matches.append(match)
+            bbox_matches = [page["texts"][index]
+                            for index in np.flatnonzero(text_matches)]
             # Search for captions using proximity (offset) and text
             # analyses (keywords)
             if len(bbox_matches) == 0:
                 pass  # don't set any caption
             elif len(bbox_matches) == 1:
-                caption = ""
-                for text_line in bbox_matches[0]:
-                    caption += text_line.get_text().strip() 
+                caption = "".join(text_line.get_text().strip()
+                                  for text_line in bbox_matches[0])
                 visual.set_caption(caption)  # TODO: fix this
             else:  # more than one matches in bbox_matches
                 for _text in bbox_matches:
-                    text_match = find_caption_by_text(
-                        _text,
-                        keywords=layout_settings["layout"]["caption"]
-                        ["keywords"]
-                        )
+                    text_match = find_caption_by_pattern(_text,
+                                                         caption_pattern)
                 if text_match:
-                    caption = ""
-                    for text_line in bbox_matches[0]:
-                        caption += text_line.get_text().strip()
+                    caption = "".join(text_line.get_text().strip()
+                                      for text_line in bbox_matches[0])
                 # Set the caption to the first text match.
                 # All other matches will be ignored.
                 # This may introduce errors, but it is better than
@@ -304,11 +370,13 @@ def extract_visuals_by_layout(pdf: str, metadata: Metadata, data_dir: str,
                         pass
 
             # rename image name to include page number
-            img.name = str(entry_id)+"-page"+str(
-                page["page_number"])+"-"+img.name
+            img.name = image_name_prefix + img.name
+            stream_key = (img.stream.objid, img.stream.genno) \
+                if img.stream.objid is not None else None
             # save image to file
             try:
-                image_file_name = iw.export_image(img)
+                image_file_name = exported_streams.get(stream_key) or \
+                    iw.export_image(img)
                 # returns image file name,
                 # which last part is automatically generated by
                 # pdfminer to guarantee uniqueness
@@ -351,16 +419,58 @@ def extract_visuals_by_layout(pdf: str, metadata: Metadata, data_dir: str,
                 Warning("TypeError, filter error PDFObjRef:"
                         + img.name)
             else:
+                if stream_key is not None:
+                    exported_streams[stream_key] = image_file_name
                 visual.set_location(
                                     FilePath(root_path=output_dir,
-                                             file_path=entry_id
-                                             + '/' + pdf_file_dir
-                                             + '/' + image_file_name))
-                # add visual to entry
-                metadata.add_visual(visual)
-    del pages  # free memory
+                                             file_path=location_prefix
+                                             + image_file_name))
+                visuals.append(visual)
+
+    return visuals, no_image_pages
+
+
+def _sort_pages(page_numbers: Optional[Iterable[int]],
+                pdf_document: Document, layout_settings: dict,
+                logger: Logger) -> Iterable[dict]:
+    """Parses the pages of a PDF file and yields their sorted layout
+    elements one page at a time. See ``_extract_layout_pages`` for the
+    parameters. Parsing stops at the first page pdfminer can't read."""
+
+    pdf_pages = extract_pages(pdf_document.location.full_path(),
+                              page_numbers=page_numbers)
+    # pdfminer numbers the selected pages from 1, not by their position
+    # in the document
+    selected_pages = sorted(page_numbers) if page_numbers is not None \
+        else None
+    img_width = layout_settings["layout"]["image"]["width"]
+    img_height = layout_settings["layout"]["image"]["height"]
+    # this checks for malformed or corrupted PDF files, and
+    # unsupported fonts and some bugs in pdfminer
+    try:
+        for index, page in enumerate(pdf_pages):
+            elements = sort_layout_elements(page, img_width=img_width,
+                                            img_height=img_height)
+            if selected_pages is not None:
+                elements["page_number"] = selected_pages[index] + 1
+            yield elements
 
-    return {'no_images_pages': no_image_pages, "metadata": metadata}
+    except PDFSyntaxError:  # skip malformed or corrupted PDF files
+        logger.error("PDFSyntaxError. Couldn't read: "
+                     + pdf_document.location.file_path)
+        Warning("PDFSyntaxError. Couldn't read: " +
+                pdf_document.location.file_path)
+    except AssertionError as e:  # skip unsupported fonts
+        logger.error("AssertionError. Unsupported font: "
+                     + pdf_document.location.file_path + str(e))
+        Warning("AssertionError. Unsupported font: " +
+                pdf_document.location.file_path + str(e))
+    except TypeError as e:  # skip bug in pdfminer
+        # no_image_pages.append(page) # pass page to OCR analysis
+        logger.error("TypeError. Bug with Predictor: "
+                     + pdf_document.location.file_path + str(e))
+        Warning("TypeError. Bug with Predictor: " +
+                pdf_document.location.file_path + str(e))
 
 
 def extract_visuals_by_ocr(metadata: Metadata, data_dir: str,
@@ -459,51 +569,33 @@ def extract_visuals_by_ocr(metadata: Metadata, data_dir: str,
     if lt_pages is not None:
         pages = lt_pages
     else:
-        pdf_pages = extract_pages(pdf)  # returns generator
-        # intantiate generator
-        
-        # TODO: find a better way to make this works for both cases:
-        # when OCR should be performed on all pages, and when it should
-        # be performed only on pages where no images were found by layout.
-        # This is a temporary solution.
-        pages = []
+        # OCR is performed on all pages. Only the page tree is read to
+        # count the pages, their content is not parsed by pdfminer
         try:
-            for page in pdf_pages:
-                elements = sort_layout_elements(
-                    page,
-                    img_width=ocr_settings["ocr"]["image"]["width"],
-                    img_height=ocr_settings["ocr"]["image"]["height"]
-                )
-                
-                pages.append(elements)
-
+            page_count = count_pdf_pages(pdf)
         except PDFSyntaxError:  # skip malformed or corrupted PDF files
             logger.error("PDFSyntaxError. Couldn't read: " + pdf)
-        except AssertionError as e:  # skip unsupported fonts
-            # no_image_pages.append(page) # pass page to OCR analysis
-            logger.error("AssertionError. Unsupported font: " + pdf + str(e))
-        except TypeError as e:  # skip bug in pdfminer
-            # no_image_pages.append(page) # pass page to OCR analysis
-            logger.error("TypeError. Bug with Predictor: " + pdf + str(e))
-        else:
-            del elements  # free memory
-
-    for page in tqdm(pages, desc="OCR analysis",  total=len(pages),
-                     unit="OCR pages"):
-
-        page_image = ocr.convert_pdf_to_image(  
-            pdf_formatted_path.full_path(),
-            dpi=ocr_settings["ocr"]["resolution"],
-            first_page=page["page_number"],
-            last_page=page["page_number"],
-            )
-
-        ocr_results = ocr.extract_bboxes_from_horc(
-            page_image, config=ocr_settings["ocr"]["tesseract"],
-            entry_id=entry_id,
-            page_number=page["page_number"],
-            resize=ocr_settings["ocr"]["resize"]
-            )
+            page_count = 0
+        pages = [{"page_number": page_number}
+                 for page_number in range(1, page_count + 1)]
+
+    # location of saved images, relative to the output directory
+    location_prefix = f'{entry_id}/{pdf_file_dir}/'
+
+    ocr_offset_dist = Offset(ocr_settings["ocr"]["caption"]["offset"][0],
+                             ocr_settings["ocr"]["caption"]["offset"][1])
+    # settings used for every page
+    resolution = ocr_settings["ocr"]["resolution"]
+    min_width = ocr_settings["ocr"]["image"]["width"]
+    min_height = ocr_settings["ocr"]["image"]["height"]
+    caption_direction = ocr_settings["ocr"]["caption"]["direction"]
+    tesseract_config = ocr_settings["ocr"]["tesseract"]
+
+    ocr_pages = _ocr_pages(pdf_formatted_path.full_path(), pages,
+                           ocr_settings, entry_id)
+    for page, page_image, ocr_results in tqdm(ocr_pages, desc="OCR analysis",
+                                              total=len(pages),
+                                              unit="OCR pages"):
 
         if ocr_results:  # skips pages with no results
             page_key = ocr_results.keys()
@@ -513,10 +605,8 @@ def extract_visuals_by_ocr(metadata: Metadata, data_dir: str,
             # filter by bbox size
             filtered_width_height = ocr.filter_bbox_by_size(
                                     ocr_results[page_id]["bboxes"],
-                                    min_width=ocr_settings["ocr"]["image"]
-                                    ["width"],
-                                    min_height=ocr_settings["ocr"]["image"]
-                                    ["height"],
+                                    min_width=min_width,
+                                    min_height=min_height,
                                     )
 
             ocr_results[page_id]["bboxes"] = filtered_width_height
@@ -543,8 +633,24 @@ def extract_visuals_by_ocr(metadata: Metadata, data_dir: str,
 
             # exclude pages with no bboxes (a.k.a. no inner images)
             if len(ocr_results[page_id]["bboxes"]) > 0:
+                # Search for captions using proximity to images.
+                # This may generate multiple matches per image. Text boxes
+                # of the page are compared with all images at once
+                bbox_objects = [BoundingBox(tuple(bbox_cords), resolution)
+                                for bbox_cords in ocr_results[page_id]
+                                ["bboxes"].values()]
+                text_objects = [BoundingBox(tuple(text_cords), resolution)
+                                for text_cords in ocr_results[page_id]
+                                ["text_bboxes"].values()]
+                caption_matches = find_captions_by_distance(
+                    bbox_objects,
+                    text_objects,
+                    offset=ocr_offset_dist,
+                    direction=caption_direction
+                )
                 # loop over imageboxes
-                for bbox_id in ocr_results[page_id]["bboxes"]:
+                for bbox_id, text_matches in zip(ocr_results[page_id]
+                                                 ["bboxes"], caption_matches):
                     # bbox of image in page
                     bbox_cords = ocr_results[page_id]["bboxes"][bbox_id]
 
@@ -552,32 +658,8 @@ def extract_visuals_by_ocr(metadata: Metadata, data_dir: str,
                                     document_page=page["page_number"],
                                     bbox=bbox_cords, bbox_units="px")
 
-                    # Search for captions using proximity to image
-                    # This may generate multiple matches
-                    bbox_matches = []
-                    bbox_object = BoundingBox(tuple(bbox_cords),
-                                              ocr_settings["ocr"]["resolution"])
-
-                    for text_box in ocr_results[page_id]["text_bboxes"].items():
-
-                        text_cords = text_box[1]
-                        text_object = BoundingBox(tuple(text_cords),
-                                                  ocr_settings["ocr"]
-                                                  ["resolution"])
-
-                        _offset = Offset(ocr_settings["ocr"]["caption"]
-                                         ["offset"][0],
-                                         ocr_settings["ocr"]["caption"]
-                                         ["offset"][1])
-                        match = find_caption_by_distance(
-                            bbox_object,
-                            text_object,
-                            offset=_offset,
-                            direction=ocr_settings["ocr"]["caption"]
-                            ["direction"]
-                        )
-                        if match:
-                            bbox_matches.append(match)
+                    bbox_matches = [text_objects[index] for index in
+                                    np.flatnonzero(text_matches)]
 
                     if len(bbox_matches) == 0:  # if more than one bbox 
                         # matches, skip and do text analysis
@@ -587,7 +669,7 @@ def extract_visuals_by_ocr(metadata: Metadata, data_dir: str,
                         for match in bbox_matches:
                             ocr_caption = ocr.region_to_string(page_image[0],
                                                                match.bbox_px(),
-                                                               config=ocr_settings["ocr"]["tesseract"])
+                                                               config=tesseract_config)
 
                             if ocr_caption:
                                 try:
@@ -598,8 +680,7 @@ def extract_visuals_by_ocr(metadata: Metadata, data_dir: str,
                                                    + str(match.bbox()))
 
                     visual.set_location(FilePath(root_path=output_dir,
-                                                 file_path=entry_id + '/'
-                                                 + pdf_file_dir + '/'
+                                                 file_path=location_prefix
                                                  + f'{page_id}-{bbox_id}.png'))
 
                     metadata.add_visual(visual)
@@ -610,6 +691,47 @@ def extract_visuals_by_ocr(metadata: Metadata, data_dir: str,
     return {'no_images_pages': no_image_pages, "metadata": metadata}
 
 
+def _ocr_pages(pdf_file: str, pages: List[dict], ocr_settings: dict,
+               entry_id: str, max_run: int = PAGES_PER_TASK
+               ) -> Iterable[Tuple[dict, list, dict]]:
+    """Renders the pages of a PDF file as images and extracts bounding
+    boxes from them with Tesseract. Yields each page with a list containing
+    its image, and the OCR results. Consecutive pages are rendered by a
+    single call to Poppler, in runs of up to `max_run` pages, and the pages
+    in a run are OCR'ed in parallel."""
+
+    runs = []
+    for page in pages:
+        if (runs and len(runs[-1]) < max_run and
+                page["page_number"] == runs[-1][-1]["page_number"] + 1):
+            runs[-1].append(page)
+        else:
+            runs.append([page])
+
+    def _extract_bboxes(page: dict, image: PIL.Image.Image) -> dict:
+        return ocr.extract_bboxes_from_horc(
+            [image], config=ocr_settings["ocr"]["tesseract"],
+            entry_id=entry_id,
+            page_number=page["page_number"],
+            resize=ocr_settings["ocr"]["resize"]
+            )
+
+    # Tesseract runs in its own process, threads only wait for it
+    with ocr.limit_tesseract_threads(), \
+            ThreadPoolExecutor(max_workers=min(max_run, os.cpu_count() or 1)
+                               ) as executor:
+        for run in runs:
+            images = ocr.convert_pdf_to_image(
+                pdf_file,
+                dpi=ocr_settings["ocr"]["resolution"],
+                first_page=run[0]["page_number"],
+                last_page=run[-1]["page_number"],
+                )
+            results = executor.map(_extract_bboxes, run, images)
+            for page, image, ocr_results in zip(run, images, results):
+                yield page, [image], ocr_results
+
+
 def find_pdf_files(directory: str, prefix: str = None) -> list:
     """
     Finds PDF files that match a given prefix.
@@ -630,15 +752,12 @@ def find_pdf_files(directory: str, prefix: str = None) -> list:
         directory path and the file name.
     """
 
-    pdf_files = []
-    for f in tqdm(os.listdir(directory), desc="Collecting PDF files",
-                  unit="files"):
-        if prefix:
-            if f.startswith(prefix) and f.endswith(".pdf"):
-                pdf_files.append(directory+f)
-        else:
-            if f.endswith(".pdf"):
-                pdf_files.append(directory+f)
+    # If prefix is None, all PDF files are included
+    prefix = prefix or ""
+    with os.scandir(directory) as entries:
+        pdf_files = [entry.path for entry in entries
+                     if entry.name.startswith(prefix) and
+                     entry.name.endswith(".pdf") and entry.is_file()]
 
     print("Found PDF files: ", len(pdf_files))
 
@@ -680,7 +799,8 @@ def start_logging(name: str, log_file: str, entry_id: str) -> Logger:
 
 def manage_input_files(pdf_files: list, destination_dir: str,
                        mods_file: str = None) -> None:
-    """copy MODS and PDF files to a directory.
+    """copy MODS and PDF files to a directory. Files are hard linked
+    when the directory is on the same file system.
 
     Parameters
     ----------
@@ -698,19 +818,147 @@ def manage_input_files(pdf_files: list, destination_dir: str,
     """
 
     if mods_file:
-        mods_file_name = pathlib.Path().stem + ".xml"
-        if not os.path.exists(os.path.join(destination_dir, mods_file_name)):
-            shutil.copy2(mods_file, destination_dir)
+        mods_file_name = os.path.basename(mods_file)
+        destination = os.path.join(destination_dir, mods_file_name)
+        if not os.path.exists(destination):
+            _link_or_copy(mods_file, destination)
 
     if len(pdf_files) > 0:
         for pdf in pdf_files:
-            if not os.path.exists(os.path.join(destination_dir,
-                                  os.path.basename(pdf))):
-                shutil.copy2(pdf, destination_dir)
+            destination = os.path.join(destination_dir, os.path.basename(pdf))
+            if not os.path.exists(destination):
+                _link_or_copy(pdf, destination)
 
     return None
 
 
+def _link_or_copy(source: str, destination: str) -> None:
+    """Creates a hard link to a file, so its content isn't copied. Files are
+    copied when a link can't be created, e.g. across file systems."""
+
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copy2(source, destination)
+
+
+def _extract_pdf_visuals(method: str, pdf: str, metadata: Metadata,
+                         data_dir: str, output_dir: str, pdf_file_dir: str,
+                         settings: dict, logger: Logger,
+                         entry_id: str, page_workers: int = 1) -> dict:
+    """Extracts visuals from a PDF file using the analysis of a pipeline:
+    'layout', 'ocr' or 'layoutocr'. Returns the results of the last
+    analysis step. `page_workers` is the number of processes used by the
+    layout analysis."""
+
+    if method == 'layout':
+        return extract_visuals_by_layout(pdf, metadata, data_dir, output_dir,
+                                         pdf_file_dir, settings, logger,
+                                         entry_id, workers=page_workers)
+    if method == 'ocr':
+        return extract_visuals_by_ocr(metadata, data_dir, output_dir,
+                                      pdf_file_dir, logger, entry_id,
+                                      settings, pdf=pdf)
+
+    # Step 1: Layout analysis
+    layout_results = extract_visuals_by_layout(
+        pdf, metadata, data_dir, output_dir, pdf_file_dir,
+        settings, logger, entry_id, workers=page_workers)
+
+    # Step 2: OCR analysis on pages where no images were found
+    # by step 1.
+    return extract_visuals_by_ocr(
+        metadata, data_dir, output_dir, pdf_file_dir,
+        logger, entry_id, settings,
+        lt_pages=layout_results["no_images_pages"])
+
+
+def _pdf_visuals_worker(method: str, pdf: str, *args
+                        ) -> Tuple[List[Document], List[Visual], List[dict]]:
+    """Runs ``_extract_pdf_visuals`` in a worker process, with its own
+    metadata object. Returns the documents and visuals added to the
+    metadata, and the pages where no images were found."""
+
+    metadata = Metadata()
+    results = _extract_pdf_visuals(method, pdf, metadata, *args)
+    return (metadata.documents or [], metadata.visuals or [],
+            results["no_images_pages"])
+
+
+def process_pdf_files(method: str, pdf_files: List[str], metadata: Metadata,
+                      data_dir: str, output_dir: str, settings: dict,
+                      logger: Logger, entry_id: str,
+                      workers: int = 1) -> dict:
+    """Extracts visuals from several PDF files of an entry. The results of
+    each PDF file are saved to a directory named after its position in the
+    list: pdf-001, pdf-002, etc.
+
+    Parameters
+    ----------
+    method : str
+        Analysis used to extract visuals. One of: 'layout', 'ocr' or
+        'layoutocr'.
+    pdf_files : List[str]
+        Paths to the PDF files as returned by find_pdf_files().
+    metadata: Metadata
+        A Metadata object to store metadata of extracted visuals.
+    data_dir : str
+        Path to the input directory containing the PDF files.
+    output_dir : str
+        Path to the output directory where visuals will be saved.
+    settings : dict
+        A dictionary containing the settings for the analysis.
+    logger : Logger
+        A logger object.
+    entry_id : str
+        Identifier of the entry being processed.
+    workers : int
+        Number of processes used to process PDF files in parallel. Default
+        is 1, which processes PDF files one after another in the current
+        process. If there is a single PDF file, the processes are used for
+        the layout analysis of its pages instead.
+
+    Returns
+    -------
+    dict
+        The results of the last PDF file, as returned by
+        extract_visuals_by_layout() or extract_visuals_by_ocr(). When
+        workers is larger than 1, the pages where no images were found
+        only contain the page number.
+    """
+
+    pdf_file_dirs = ['pdf-' + str(counter).zfill(3)
+                     for counter in range(1, len(pdf_files) + 1)]
+    results = {}
+
+    if workers <= 1 or len(pdf_files) <= 1:
+        for pdf, pdf_file_dir in zip(pdf_files, pdf_file_dirs):
+            print("--> Processing file:", pdf)
+            results = _extract_pdf_visuals(method, pdf, metadata, data_dir,
+                                           output_dir, pdf_file_dir,
+                                           settings, logger, entry_id,
+                                           page_workers=workers)
+        return results
+
+    # PDF files are independent from each other, they are processed
+    # in parallel and their results are added in the original order
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_pdf_visuals_worker, method, pdf,
+                                   data_dir, output_dir, pdf_file_dir,
+                                   settings, logger, entry_id)
+                   for pdf, pdf_file_dir in zip(pdf_files, pdf_file_dirs)]
+        for pdf, future in zip(pdf_files, futures):
+            print("--> Processing file:", pdf)
+            documents, visuals, no_image_pages = future.result()
+            for document in documents:
+                metadata.add_document(document)
+            metadata.extend_visuals(visuals)
+            results = {'no_images_pages': no_image_pages,
+                       "metadata": metadata}
+
+    return results
+
+
 class Layout(Pipeline):
     """A pipeline for extracting metadata and visuals from PDF
       files using a layout analysis. Layout analysis recursively
@@ -756,7 +1004,7 @@ class Layout(Pipeline):
         if self.ignore_id:
             search_prefix = None
         else:
-            search_prefix = pathlib.Path(MODS_FILE).stem.split("_")[0]
+            search_prefix = entry_id  # taken from the MODS file name
 
         if self.settings is None:
             raise ValueError("No settings provided")
@@ -780,20 +1028,9 @@ class Layout(Pipeline):
         logger.info("PDF files in entry: " + str(len(PDF_FILES)))
 
         # PROCESS PDF FILES
-        pdf_document_counter = 1
-        results = {}
-        for pdf in PDF_FILES:
-
-            print("--> Processing file:", pdf)
-            pdf_file_dir = 'pdf-' + str(pdf_document_counter).zfill(3)
-
-            results = extract_visuals_by_layout(pdf, meta_entry, DATA_DIR,
-                                                OUTPUT_DIR, pdf_file_dir,
-                                                self.settings, logger,
-                                                entry_id,
-                                                )
-
-            pdf_document_counter += 1
+        results = process_pdf_files('layout', PDF_FILES, meta_entry, DATA_DIR,
+                                    OUTPUT_DIR, self.settings, logger,
+                                    entry_id, workers=self.workers)
 
         end_time = time.time()
         processing_time = end_time - start_time
@@ -878,7 +1115,7 @@ class OCR(Pipeline):
         if self.ignore_id:
             search_prefix = None
         else:
-            search_prefix = pathlib.Path(MODS_FILE).stem.split("_")[0]
+            search_prefix = entry_id  # taken from the MODS file name
 
         if self.settings is None:
             raise ValueError("No settings provided")
@@ -901,21 +1138,9 @@ class OCR(Pipeline):
         logger.info("PDF files in entry: " + str(len(PDF_FILES)))
 
         # PROCESS PDF FILES
-        pdf_document_counter = 1
-        results = {}
-        for pdf in PDF_FILES:
-
-            print("--> Processing file:", pdf)
-            pdf_file_dir = 'pdf-' + str(pdf_document_counter).zfill(3)
-
-            results = extract_visuals_by_ocr(meta_entry, DATA_DIR,
-                                             OUTPUT_DIR, pdf_file_dir,
-                                             logger,
-                                             entry_id, self.settings,
-                                             pdf=pdf
-                                             )
-
-            pdf_document_counter += 1
+        results = process_pdf_files('ocr', PDF_FILES, meta_entry, DATA_DIR,
+                                    OUTPUT_DIR, self.settings, logger,
+                                    entry_id, workers=self.workers)
 
         end_time = time.time()
         processing_time = end_time - start_time
@@ -1007,7 +1232,7 @@ class LayoutOCR(Pipeline):
         if self.ignore_id:
             search_prefix = None
         else:
-            search_prefix = pathlib.Path(MODS_FILE).stem.split("_")[0]
+            search_prefix = entry_id  # taken from the MODS file name
 
         if self.settings is None:
             raise ValueError("No settings provided")
@@ -1031,26 +1256,9 @@ class LayoutOCR(Pipeline):
         logger.info("PDF files in entry: " + str(len(PDF_FILES)))
 
         # PROCESS PDF FILES
-        pdf_document_counter = 1
-        results = {}
-        for pdf in PDF_FILES:
-
-            print("--> Processing file:", pdf)
-            pdf_file_dir = 'pdf-' + str(pdf_document_counter).zfill(3)
-
-            # Step 1: Layout analysis
-            layout_results = extract_visuals_by_layout(
-                pdf, meta_entry, DATA_DIR, OUTPUT_DIR, pdf_file_dir,
-                self.settings, logger, entry_id)
-            
-            # Step 2: OCR analysis on pages where no images were found
-            # by step 1.
-            results = extract_visuals_by_ocr(
-                meta_entry, DATA_DIR, OUTPUT_DIR, pdf_file_dir,
-                logger, entry_id, self.settings,
-                lt_pages=layout_results["no_images_pages"])
-
-            pdf_document_counter += 1
+        results = process_pdf_files('layoutocr', PDF_FILES, meta_entry, DATA_DIR,
+                                    OUTPUT_DIR, self.settings, logger,
+                                    entry_id, workers=self.workers)
 
         end_time = time.time()
         processing_time = end_time - start_time
@@ -1,19 +1,35 @@
 import requests
 import re
 import os
+import json
+import hashlib
+import shutil
 import pathlib
-from bs4 import BeautifulSoup
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import List
+from bs4 import BeautifulSoup, SoupStrainer
+from requests.adapters import HTTPAdapter
 
+# HTTP session shared by the functions that download from the Thesis
+# repository, connections to the same host are reused between requests
+_SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16))
 
-def create_output_dir(base_path: str, path="") -> str:
+# file name in a content-disposition header, without double quotes
+_FILENAME_RE = re.compile(r'filename="?([^";]+)"?')
+
+
+def create_output_dir(base_path: str | pathlib.Path,
+                      path: str = "") -> pathlib.Path:
     """
     creates a directory in the base path if it doesn't exists.
 
     Parameters
     ----------
-    base_path: str
+    base_path: str | Pathlib object
         path to destination directory
-    name: str
+    path: str
         name or path for the new directory, parent directories are
         created if they don't exists
 
@@ -24,13 +40,10 @@ def create_output_dir(base_path: str, path="") -> str:
         newly created directory
     """
 
-    if isinstance(base_path, pathlib.Path):
-        base_path = str(base_path)
-
-    full_path = os.path.join(base_path, path)
-    pathlib.Path(full_path).mkdir(parents=True, exist_ok=True)
+    full_path = pathlib.Path(base_path, path)
+    full_path.mkdir(parents=True, exist_ok=True)
 
-    return pathlib.Path(full_path)
+    return full_path
 
 
 def convert_mm_to_point(quantity: float) -> float:
@@ -74,14 +87,20 @@ def convert_dpi_to_point(quantity: float, dpi: int) -> float:
     return quantity / dpi * 72
 
 
-def extract_metadata_from_html(reference_url: str) -> dict:
+def extract_metadata_from_html(reference_url: str,
+                               cache_dir: str | pathlib.Path = None) -> dict:
     """ Extracts metadata from HTML pages from the Thesis repository,
-    TU Delft Library.
+    TU Delft Library. Results are cached in memory, pages are downloaded
+    once per process.
 
     Parameters
     ----------
     reference_url: str
         URL from 'to reference to this document use'
+    cache_dir: str | Pathlib object
+        path to a directory where results are also cached as JSON files,
+        to reuse them across runs. If None, results are not saved to disk.
+        Default is None.
 
     Returns
     -------
@@ -89,31 +108,54 @@ def extract_metadata_from_html(reference_url: str) -> dict:
         metadata from HTML page
     """
 
-    # download html page
-    html_doc = requests.get(reference_url)
-    html_doc.raise_for_status
-
-    # parsing html content
-    soup = BeautifulSoup(html_doc.content, 'html.parser')
-    pdf_object = soup.find_all("fieldset",
-                               class_="islandora islandora-metadata")
-    meta_element, val_element = pdf_object[0].find_all("span", class_="label"),
-    pdf_object[0].find_all("span", class_="value")
-
-    attributes_ = []
-    for attribute in meta_element:
-        attributes_.append(attribute.text.lower())  # attribute names are
-        # converted to lower case
-    # TODO: find a way to separate subject keyworkds
+    if cache_dir is None:
+        return dict(_fetch_metadata_from_html(reference_url))
+
+    cache_file = os.path.join(
+        cache_dir, hashlib.sha1(reference_url.encode()).hexdigest() + ".json")
+    if os.path.isfile(cache_file):
+        with open(cache_file) as f:
+            return json.load(f)
 
-    values_ = []
-    for val in val_element:
-        if val.text == "Subject":
-            print("this is the subject")
-        values_.append(val.find("p").text)
+    metadata = dict(_fetch_metadata_from_html(reference_url))
+    create_output_dir(cache_dir)
+    with open(cache_file, 'w') as f:
+        json.dump(metadata, f)
 
-    # assamble result in a dictionary
-    metadata = {attributes_[i]: values_[i] for i in range(len(attributes_))}
+    return metadata
+
+
+@lru_cache(maxsize=1024)
+def _fetch_metadata_from_html(reference_url: str) -> dict:
+    """Downloads and parses an HTML page of the Thesis repository. See
+    ``extract_metadata_from_html``. Callers must not modify the result,
+    it is shared by the cache."""
+
+    # download html page
+    html_doc = _SESSION.get(reference_url)
+    html_doc.raise_for_status()
+
+    # parsing html content. Only the metadata fieldset is parsed
+    metadata_fieldset = SoupStrainer("fieldset",
+                                     class_="islandora islandora-metadata")
+    # requests reports ISO-8859-1 for text/html without a charset, the
+    # encoding is only passed on when the server declares one. Otherwise
+    # BeautifulSoup detects it from the content
+    content_type = html_doc.headers.get('content-type', '')
+    encoding = html_doc.encoding if 'charset=' in content_type.lower() \
+        else None
+    soup = BeautifulSoup(html_doc.content, 'lxml',
+                         from_encoding=encoding,
+                         parse_only=metadata_fieldset)
+    pdf_object = soup.find("fieldset")
+    meta_element = pdf_object.find_all("span", class_="label")
+    val_element = pdf_object.find_all("span", class_="value")
+
+    # assamble result in a dictionary, labels and values are paired in
+    # document order. Attribute names are converted to lower case
+    # TODO: find a way to separate subject keyworkds
+    metadata = {attribute.text.lower(): val.find("p").text
+                for attribute, val in zip(meta_element, val_element)}
 
     return metadata
 
@@ -135,23 +177,65 @@ def download_PDF(download_url: str, destination: str) -> None:
     None
     """
 
-    response = requests.get(download_url, stream=True)
-    # get file name
-    dis = response.headers['content-disposition']
-    file_name = re.findall("filename=(.+)", dis)[0]
+    # the response is closed on exit, also on errors, so its connection
+    # returns to the pool of the session
+    with _SESSION.get(download_url, stream=True) as response:
+        response.raise_for_status()
+        # get file name
+        dis = response.headers['content-disposition']
+        new_file_name = _FILENAME_RE.search(dis).group(1)
+
+        # prepare output directory, it will be created if it
+        # doesn't exists
+        full_path = create_output_dir(destination)
+        file_path = os.path.join(full_path, new_file_name)
+
+        # stream file content and save it to destination, in chunks of 1 MiB.
+        # Content encoded by the server (e.g. gzip) is decoded
+        response.raw.decode_content = True
+        content_length = response.headers.get('content-length')
+        with open(file_path, 'wb') as f:
+            # when the size is known, reserve disk space for the whole file
+            # at once. posix_fallocate is only available on some platforms
+            if content_length and hasattr(os, 'posix_fallocate'):
+                try:
+                    os.posix_fallocate(f.fileno(), 0, int(content_length))
+                except (OSError, ValueError):
+                    pass
+            shutil.copyfileobj(response.raw, f, length=1024 * 1024)
+            # content-length is the size before decoding, drop any space
+            # reserved beyond the end of the decoded content
+            f.truncate()
 
-    # remove double quoates from file name
-    new_file_name = file_name.strip('"')
+    return None
+
+
+def download_PDFs(download_urls: List[str], destination: str,
+                  max_workers: int = 8) -> None:
+    """
+    Downloads several files from the Thesis repository, TU Delft Library to
+    a destination directory. Files are downloaded in parallel, reusing
+    the connections to the repository.
+
+    Parameters
+    ----------
+    download_urls: List[str]
+        URLs of the files to download
+    destination: str
+        path to a directory to store the downloaded files
+    max_workers: int
+        maximum number of files downloaded at the same time. Default is 8.
 
-    # prepare output directory, it will be created if it
-    # doesn't exists
-    full_path = create_output_dir(destination)
-    file_path = os.path.join(full_path, new_file_name)
+    Returns
+    -------
+    None
+    """
 
-    # stream file content and save it to destination
-    with open(file_path, 'wb') as f:
-        for chunk in response.iter_content(chunk_size=2000):
-            f.write(chunk)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(download_PDF, download_url, destination)
+                   for download_url in download_urls]
+        for future in futures:
+            future.result()  # raises download errors
 
     return None
 
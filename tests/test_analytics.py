@@ -7,6 +7,12 @@ Pytest will automatically run all functions that start with test_ in this file.
 from visarchpy import analytics
 import pytest
 import os
+import numpy as np
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+from PIL import Image
+from sklearn.cluster import KMeans
 
 
 
@@ -37,3 +43,49 @@ class TestGetImagePaths:
         assert result == [os.path.join(image_directory, file) for file in os.listdir(image_directory) if file.endswith('.jpg')]
 
 
+@pytest.fixture(scope='module')
+def images(tmp_path_factory):
+    """
+    Fixture of image files of different sizes
+    """
+    directory = tmp_path_factory.mktemp('images')
+    files = []
+    for index, size in enumerate([(10, 20), (30, 30), (60, 40)]):
+        file = str(directory / f'{index}.png')
+        Image.new('RGB', size).save(file)
+        files.append(file)
+    return files
+
+
+@pytest.fixture(scope='module')
+def predictor():
+    """
+    Fixture of a Kmeans model fitted on the image sizes
+    """
+    return KMeans(n_clusters=2, n_init=1, random_state=0).fit(
+        np.array([(10, 20), (30, 30), (60, 40)]))
+
+
+class TestPlotBboxes:
+    """Test class for plot_bboxes with precomputed labels"""
+
+    def test_labels_with_predictor(self, images, predictor):
+        """Test labels computed by the predictor are plotted"""
+        figure, ax = plt.subplots()
+        analytics.plot_bboxes(images, predictor=predictor, show=False,
+                              labels=list(predictor.labels_), ax=ax)
+        assert len(ax.collections[0].get_paths()) == 3
+        plt.close(figure)
+
+    def test_labels_without_predictor(self, images):
+        """Test labels without the predictor that computed them raise
+        ValueError"""
+        with pytest.raises(ValueError):
+            analytics.plot_bboxes(images, show=False, labels=[0, 1, 1])
+
+    def test_labels_count(self, images, predictor):
+        """Test a number of labels different from the number of images
+        raises ValueError"""
+        with pytest.raises(ValueError):
+            analytics.plot_bboxes(images, predictor=predictor, show=False,
+                                  labels=[0, 1])
@@ -3,6 +3,7 @@ Units tests for captions.py
 Pytest will automatically run all functions that start with test_ in this file.
 """
 from visarchpy import captions
+import re
 import pytest
 
 
@@ -52,3 +53,154 @@ class TestBoundingBox:
     def test_bbox(self, bbox_):
         """Test BoundingBox bbox method has the correct number of coordinates"""
         assert len(bbox_.bbox()) == 4
+
+
+class TestFindCaptionByDistance:
+    """ Test find_caption_by_distance function"""
+
+    image = captions.BoundingBox((10, 10, 20, 20), "pt")
+    offset = captions.Offset(5, "px")
+
+    def test_all_directions(self):
+        """Test text near the image is matched in all directions, and text
+        inside the image is ignored"""
+        near = captions.BoundingBox((22, 12, 30, 14), "pt")
+        inside = captions.BoundingBox((12, 12, 18, 18), "pt")
+        far = captions.BoundingBox((40, 40, 50, 50), "pt")
+
+        assert captions.find_caption_by_distance(self.image, near,
+                                                 self.offset) == near
+        assert not captions.find_caption_by_distance(self.image, inside,
+                                                     self.offset)
+        assert not captions.find_caption_by_distance(self.image, far,
+                                                      self.offset)
+
+    def test_down(self):
+        """Test text below the image is only matched when searching down"""
+        below = captions.BoundingBox((12, 6, 18, 8), "pt")
+
+        assert captions.find_caption_by_distance(self.image, below,
+                                                 self.offset, "down") == below
+        assert not captions.find_caption_by_distance(self.image, below,
+                                                     self.offset, "up")
+
+    def test_right(self):
+        """Test the search area to the right is limited to the offset"""
+        near = captions.BoundingBox((22, 12, 24, 14), "pt")
+        far = captions.BoundingBox((28, 12, 30, 14), "pt")
+
+        assert captions.find_caption_by_distance(self.image, near,
+                                                 self.offset, "right") == near
+        assert not captions.find_caption_by_distance(self.image, far,
+                                                     self.offset, "right")
+
+    def test_direction_aliases(self):
+        """Test both spellings of combined directions are accepted"""
+        below = captions.BoundingBox((12, 6, 18, 8), "pt")
+
+        for direction in ["right-down", "down-right"]:
+            assert captions.find_caption_by_distance(
+                self.image, below, self.offset, direction) == below
+
+    def test_invalid_direction(self):
+        """Test invalid direction raises ValueError"""
+        with pytest.raises(ValueError):
+            captions.find_caption_by_distance(self.image, self.image,
+                                              self.offset, "diagonal")
+
+
+def test_find_captions_by_distance():
+    """Test batch matching is equivalent to matching each pair"""
+    images = [captions.BoundingBox((10, 10, 20, 20), "pt"),
+              captions.BoundingBox((40, 40, 60, 60), "pt")]
+    texts = [captions.BoundingBox((12, 6, 18, 8), "pt"),
+             captions.BoundingBox((12, 12, 18, 18), "pt"),
+             captions.BoundingBox((45, 35, 55, 38), "pt")]
+    offset = captions.Offset(5, "px")
+
+    for direction in [None, "down", "up"]:
+        mask = captions.find_captions_by_distance(images, texts, offset,
+                                                  direction)
+        assert mask.shape == (2, 3)
+        for i, image in enumerate(images):
+            for j, text in enumerate(texts):
+                assert mask[i, j] == bool(captions.find_caption_by_distance(
+                    image, text, offset, direction))
+
+
+def test_find_captions_by_index():
+    """Test indexed search returns the same texts as pairwise matching"""
+    image = captions.BoundingBox((10, 10, 20, 20), "pt")
+    texts = [captions.BoundingBox((12, 6, 18, 8), "pt"),
+             captions.BoundingBox((12, 12, 18, 18), "pt"),
+             captions.BoundingBox((22, 12, 30, 14), "pt"),
+             captions.BoundingBox((40, 40, 50, 50), "pt")]
+    offset = captions.Offset(5, "px")
+    index = captions.build_text_index(texts)
+
+    for direction in [None, "down", "right"]:
+        expected = [text for text in texts if
+                    captions.find_caption_by_distance(image, text, offset,
+                                                      direction)]
+        assert captions.find_captions_by_index(image, index, texts, offset,
+                                               direction) == expected
+
+
+@pytest.fixture(scope="module")
+def text_boxes():
+    """Fixture for the text boxes of a PDF page with figure captions"""
+    from pdfminer.high_level import extract_pages
+    from pdfminer.layout import LTTextBox
+
+    page = next(extract_pages("tests/data/multi-image-caption.pdf"))
+    return [element for element in page if isinstance(element, LTTextBox)]
+
+
+class TestCaptionPattern:
+    """ Test matching captions by keywords"""
+
+    def test_default_pattern(self):
+        """Test default keywords compile to a single anchored group"""
+        assert captions.CAPTION_RE.pattern == r'^(?:figure|caption|figuur)'
+        assert captions.compile_caption_pattern() is captions.CAPTION_RE
+
+    def test_match_keywords(self, text_boxes):
+        """Test text boxes starting with a keyword are matched, regardless
+        of case"""
+        matches = [box for box in text_boxes
+                   if captions.find_caption_by_text(box)]
+
+        assert len(matches) == 3
+        assert all(box.get_text().startswith('Figure') for box in matches)
+
+    def test_match_mixed_keywords(self, text_boxes):
+        """Test plain and special-character keywords give the same matches
+        as plain keywords alone"""
+        plain = [box for box in text_boxes
+                 if captions.find_caption_by_text(box, ['figure'])]
+        mixed = [box for box in text_boxes
+                 if captions.find_caption_by_text(box, ['figure', 'fig.'])]
+
+        assert len(plain) == 3
+        assert plain == mixed
+
+    def test_keywords_are_escaped(self, text_boxes):
+        """Test keywords with special characters are matched literally"""
+        assert not any(captions.find_caption_by_text(box, ['fig.'])
+                       for box in text_boxes)
+        assert not any(captions.find_caption_by_text(box, ['.*'])
+                       for box in text_boxes)
+
+    def test_match_user_pattern_across_lines(self, text_boxes):
+        """Test patterns not built from keywords are matched against the
+        full text of a text box, not only its first line"""
+        box = next(box for box in text_boxes if len(box) > 1)
+        last_line = list(box)[-1].get_text().strip()
+        for pattern in [re.compile(r'[\s\S]*' + re.escape(last_line)),
+                        re.compile(r'.*' + re.escape(last_line), re.DOTALL)]:
+            assert captions.find_caption_by_pattern(box, pattern) is box
+
+    def test_empty_keywords(self):
+        """Test an empty list of keywords raises ValueError"""
+        with pytest.raises(ValueError):
+            captions.compile_caption_pattern([])
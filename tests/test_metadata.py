@@ -4,6 +4,8 @@ Test for metadata pakcage
 
 import pytest
 import os
+import json
+import numpy as np
 import visarchpy.metadata as metadata
 import warnings
 
@@ -75,5 +77,84 @@ class TestDocumentClass:
         _path = metadata.FilePath(root_path, file_path)
         doc = metadata.Document(_path)
         assert doc.location.full_path() == str(os.path.join(root_path, file_path))
-   
 
+
+class TestVisualClass:
+    """test for the Visual class"""
+
+    def test_unique_id(self, root_path, file_path):
+        """
+        test every visual gets its own id
+        """
+        doc = metadata.Document(metadata.FilePath(root_path, file_path))
+        visuals = [metadata.Visual(doc, 1, [0, 0, 10, 10], "pt")
+                   for _ in range(3)]
+        assert len({visual.id for visual in visuals}) == 3
+
+
+class TestMetadataClass:
+    """test for the Metadata class"""
+
+    def test_extend_visuals(self, root_path, file_path):
+        """
+        test several visuals can be added at once
+        """
+        doc = metadata.Document(metadata.FilePath(root_path, file_path))
+        visuals = [metadata.Visual(doc, 1, [0, 0, 10, 10], "pt")
+                   for _ in range(3)]
+        meta = metadata.Metadata()
+        meta.extend_visuals([])
+        assert meta.visuals is None
+        meta.add_visual(visuals[0])
+        meta.extend_visuals(visuals[1:])
+        assert meta.visuals == visuals
+        assert meta.total_visuals == 3
+
+        with pytest.raises(TypeError):
+            meta.extend_visuals([doc])
+
+    def test_to_dataframe(self):
+        """
+        test the metadata of several entries is converted to one DataFrame
+        """
+        records = [metadata.Metadata() for _ in range(3)]
+        for index, record in enumerate(records):
+            record.title = f"title {index}"
+        dataframe = metadata.Metadata.to_dataframe(records)
+        assert dataframe.shape[0] == 3
+        assert list(dataframe["title"]) == ["title 0", "title 1", "title 2"]
+        assert list(dataframe.columns) == \
+            list(records[0].as_dataframe().columns)
+
+    def test_save_to_json(self, root_path, file_path, tmp_path):
+        """
+        test all fields, including those left at their default value,
+        are written to the JSON file
+        """
+        doc = metadata.Document(metadata.FilePath(root_path, file_path))
+        meta = metadata.Metadata()
+        meta.title = "title"
+        meta.add_visual(metadata.Visual(doc, 1, [0, 0, 10, 10], "pt"))
+        json_file = tmp_path / "metadata.json"
+        meta.save_to_json(str(json_file))
+        with open(json_file) as f:
+            assert json.load(f) == meta.as_dict()
+
+    def test_save_to_json_values(self, tmp_path):
+        """
+        test NumPy values and non-string keys are written, and read back
+        as JSON values
+        """
+        meta = metadata.Metadata()
+        meta.extent = [np.float64(1.5), np.int64(2), float("nan")]
+        meta.classification = [{1: "a", None: "b"}]
+        json_file = tmp_path / "metadata.json"
+        meta.save_to_json(str(json_file))
+        # the file is indented with 2 spaces
+        assert json_file.read_text().startswith('{\n  "documents"')
+        with open(json_file) as f:
+            content = json.load(f)
+        assert content["extent"] == [1.5, 2, None]
+        assert content["classification"] == [{"1": "a", "null": "b"}]
+        assert content["title"] is None
+        assert content["total_visuals"] == 0
@@ -3,6 +3,7 @@ Test for OCR pipeline
 """
 
 
+import os
 import pytest
 import visarchpy.ocr as ocr 
 
@@ -54,3 +55,18 @@ def test_filter_bbox_contained_overlaps(overlaping_boxes):
     """
 
     assert ocr.filter_bbox_contained(overlaping_boxes) == overlaping_boxes
+
+
+def test_limit_tesseract_threads(monkeypatch):
+    """Test the thread limit is only set inside the context, and a limit
+    set by the user is kept"""
+
+    monkeypatch.delenv("OMP_THREAD_LIMIT", raising=False)
+    with ocr.limit_tesseract_threads():
+        assert os.environ["OMP_THREAD_LIMIT"] == "1"
+    assert "OMP_THREAD_LIMIT" not in os.environ
+
+    monkeypatch.setenv("OMP_THREAD_LIMIT", "4")
+    with ocr.limit_tesseract_threads():
+        assert os.environ["OMP_THREAD_LIMIT"] == "4"
+    assert os.environ["OMP_THREAD_LIMIT"] == "4"
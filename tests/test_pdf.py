@@ -5,6 +5,8 @@ Test for pdf.py
 
 import pytest
 from pdfminer import high_level
+from pdfminer.layout import LTPage, LTImage
+from pdfminer.pdftypes import PDFStream
 import visarchpy.pdf as pdf
 
 
@@ -24,3 +26,28 @@ def test_extract_pages():
     assert "texts" in results
     assert "images" in results
     assert "vectors" in results
+
+
+def test_count_pdf_pages():
+    """
+    Test count_pdf_pages function
+    """
+    assert pdf.count_pdf_pages("./tests/data/multi-image-caption.pdf") == 1
+
+
+def test_sort_layout_elements_unknown_image_size():
+    """
+    Test images without a width or height are kept with a warning, and
+    small images are removed
+    """
+    page = LTPage(1, (0, 0, 600, 800))
+    for name, attrs in [("large", {"Width": 200, "Height": 200}),
+                        ("unknown", {"Height": 300}),
+                        ("small", {"Width": 10, "Height": 10})]:
+        page.add(LTImage(name, PDFStream(attrs, b""), (0, 0, 100, 100)))
+
+    with pytest.warns(UserWarning, match="no width or height"):
+        results = pdf.sort_layout_elements(page, img_width=100)
+
+    assert [image.name for image in results["images"]] == ["large",
+                                                            "unknown"]
@@ -4,7 +4,15 @@ Pytest will automatically run all functions that start with test_ in this file.
 """
 
 import os
-from visarchpy.pipelines import start_logging, find_pdf_files
+import shutil
+import logging
+import numpy as np
+import matplotlib.pyplot as plt
+from matplotlib.backends.backend_pdf import PdfPages
+from visarchpy.pipelines import (start_logging, find_pdf_files,
+                                 process_pdf_files,
+                                 extract_visuals_by_layout)
+from visarchpy.metadata import Metadata
 from logging import Logger
 
 
@@ -29,3 +37,71 @@ def test_find_pdf_files():
     pdf_files = find_pdf_files("tests/data")
     assert isinstance(pdf_files, list)
     assert len(pdf_files) == 1
+
+
+def test_process_pdf_files_in_parallel(tmp_path):
+    """Test PDF files processed in parallel give the same visuals, in the
+    same order, as PDF files processed one after another"""
+
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    for name in ["a.pdf", "b.pdf"]:
+        shutil.copy2("tests/data/multi-image-caption.pdf", data_dir / name)
+    # the pipelines expect the data directory to end with a slash
+    data_dir = str(data_dir) + "/"
+    pdf_files = sorted(find_pdf_files(data_dir))
+    settings = {"layout": {"caption": {"offset": [4, "mm"],
+                                       "direction": "down",
+                                       "keywords": ["figure"]},
+                           "image": {"width": 120, "height": 120}}}
+    logger = logging.getLogger("test_process_pdf_files")
+
+    visuals = {}
+    for workers in [1, 2]:
+        metadata = Metadata()
+        process_pdf_files("layout", pdf_files, metadata, data_dir,
+                          str(tmp_path / str(workers)), settings, logger,
+                          "00000", workers=workers)
+        assert len(metadata.documents) == 2
+        visuals[workers] = [(visual.document.location.file_path,
+                             visual.caption, visual.location.file_path)
+                            for visual in metadata.visuals]
+
+    assert len(visuals[1]) == 6
+    assert visuals[1] == visuals[2]
+
+
+def test_extract_visuals_by_layout_in_parallel(tmp_path):
+    """Test pages analysed in worker processes keep their page numbers"""
+
+    # a PDF file with an image on every third page
+    pdf_file = tmp_path / "pages.pdf"
+    with PdfPages(pdf_file) as pdf:
+        for page_number in range(1, 16):
+            figure = plt.figure(figsize=(4, 4))
+            if page_number % 3 == 0:
+                axes = figure.add_axes([0.1, 0.3, 0.8, 0.6])
+                axes.imshow(np.zeros((100, 100)))
+            figure.text(0.1, 0.1, f"Figure {page_number}")
+            pdf.savefig(figure)
+            plt.close(figure)
+    settings = {"layout": {"caption": {"offset": [4, "mm"],
+                                       "direction": "down",
+                                       "keywords": ["figure"]},
+                           "image": {"width": 50, "height": 50}}}
+    logger = logging.getLogger("test_extract_visuals_by_layout")
+
+    pages = {}
+    for workers in [1, 2]:
+        metadata = Metadata()
+        results = extract_visuals_by_layout(
+            str(pdf_file), metadata, str(tmp_path) + "/",
+            str(tmp_path / str(workers)), "pdf", settings, logger,
+            "00000", workers=workers)
+        pages[workers] = ([visual.document_page
+                           for visual in metadata.visuals],
+                          [page["page_number"]
+                           for page in results["no_images_pages"]])
+
+    assert pages[1][0] == [3, 6, 9, 12, 15]
+    assert pages[1] == pages[2]
@@ -3,9 +3,22 @@ Unit tests for dinov2/transformer.py
 """
 
 import pytest
+import pickle
+import numpy as np
+import pandas as pd
+import torch
+from PIL import Image
 from transformers.modeling_outputs import BaseModelOutputWithPooling 
 from torch import Tensor
-from visarchpy.dino.transformer import transform_to_dinov2
+import visarchpy.dino.transformer as transformer
+from visarchpy.dino.transformer import (transform_to_dinov2,
+                                        transform_to_dinov2_batch,
+                                        save_npy_dinov2, save_csv_dinov2,
+                                        save_pickle_dinov2,
+                                        load_pickle_dinov2,
+                                        _float32_matmul_precision,
+                                        _compile_dinov2,
+                                        _load_dinov2, _DinoV2Transform)
 
 
 @pytest.fixture(scope='class')
@@ -43,3 +56,201 @@ def test_output_tensor_dimmensions(image_file, dinov2_model):
 
     assert outputs['tensor'].ndim == 2
 
+
+def test_batch_outputs(image_file, dinov2_model):
+    """
+    Test that batch results are equivalent to single image results, and that
+    invalid image files are returned without results
+    """
+
+    single = transform_to_dinov2(image_file, dinov2_model)
+    batch = list(transform_to_dinov2_batch(
+        [image_file, 'tests/data/sample-mods.xml'], dinov2_model))
+
+    assert len(batch) == 2
+    results = dict(batch)
+    assert results['tests/data/sample-mods.xml'] is None
+    assert results[image_file]['tensor'].shape == single['tensor'].shape
+    assert isinstance(results[image_file]['object'],
+                      BaseModelOutputWithPooling)
+
+
+def test_invalid_image_file(dinov2_model):
+    """
+    Test that an invalid image file raises IOError
+    """
+
+    with pytest.raises(IOError):
+        transform_to_dinov2('tests/data/sample-mods.xml', dinov2_model)
+
+
+@pytest.mark.parametrize("half", [False, True])
+def test_save_npy(tmp_path, half):
+    """
+    Test that a tensor saved to a NPY file is read back with the same values,
+    in half precision if requested
+    """
+
+    tensor = torch.rand(257, 384)
+    npy_file = tmp_path / "features.npy"
+    save_npy_dinov2(str(npy_file), tensor, half=half)
+    array = np.load(npy_file)
+
+    assert array.shape == (257, 384)
+    assert array.dtype == (np.float16 if half else np.float32)
+    np.testing.assert_allclose(array, tensor.numpy(),
+                               rtol=1e-3 if half else 0,
+                               atol=1e-4 if half else 0)
+
+
+def test_save_csv(tmp_path):
+    """
+    Test that a tensor saved to a CSV file is read back as a dataframe with
+    the same values, and column numbers as header
+    """
+
+    tensor = torch.rand(257, 384)
+    csv_file = tmp_path / "features.csv"
+    save_csv_dinov2(str(csv_file), tensor)
+    df = pd.read_csv(csv_file)
+
+    assert list(df.columns) == [str(column) for column in range(384)]
+    np.testing.assert_allclose(df.to_numpy(dtype=np.float32), tensor.numpy())
+
+
+@pytest.mark.parametrize("half", [False, True])
+def test_save_pickle(tmp_path, half):
+    """
+    Test that model outputs saved to a file are loaded back as an outputs
+    object with the same tensors
+    """
+
+    outputs = BaseModelOutputWithPooling(
+        last_hidden_state=torch.rand(1, 257, 384),
+        pooler_output=torch.rand(1, 384))
+    pickle_file = tmp_path / "features.pickle"
+    save_pickle_dinov2(str(pickle_file), outputs, half=half)
+    loaded = load_pickle_dinov2(str(pickle_file))
+
+    assert isinstance(loaded, BaseModelOutputWithPooling)
+    assert list(loaded.keys()) == list(outputs.keys())
+    for key in outputs.keys():
+        assert loaded[key].dtype == (torch.float16 if half else torch.float32)
+        torch.testing.assert_close(loaded[key].float(), outputs[key],
+                                   rtol=1e-3 if half else 0,
+                                   atol=1e-4 if half else 0)
+
+
+def test_load_legacy_pickle(tmp_path):
+    """
+    Test that files with the pickled outputs object, written by older
+    versions, can still be loaded
+    """
+
+    outputs = BaseModelOutputWithPooling(
+        last_hidden_state=torch.rand(1, 257, 384),
+        pooler_output=torch.rand(1, 384))
+    pickle_file = tmp_path / "features.pickle"
+    with open(pickle_file, 'wb') as f:
+        pickle.dump(outputs, f)
+    loaded = load_pickle_dinov2(str(pickle_file))
+
+    assert isinstance(loaded, BaseModelOutputWithPooling)
+    for key in outputs.keys():
+        torch.testing.assert_close(loaded[key], outputs[key])
+
+
+def test_float32_matmul_precision():
+    """
+    Test that the matmul precision is only changed inside the context
+    """
+
+    previous = torch.get_float32_matmul_precision()
+    with _float32_matmul_precision('medium'):
+        assert torch.get_float32_matmul_precision() == 'medium'
+    assert torch.get_float32_matmul_precision() == previous
+
+    with _float32_matmul_precision(None):
+        assert torch.get_float32_matmul_precision() == previous
+
+
+def test_compiled_model_is_cached():
+    """
+    Test that a model is compiled once, and the compiled model is reused
+    """
+
+    model = torch.nn.Linear(4, 4)
+    compiled = _compile_dinov2(model)
+
+    assert compiled is _compile_dinov2(model)
+    assert compiled is not model
+
+
+@pytest.mark.parametrize("size", [(224, 224), (640, 480), (300, 800),
+                                  (1000, 257)])
+def test_transform_matches_processor(dinov2_model, size):
+    """
+    Test that images preprocessed with Pillow and NumPy are the same as
+    images preprocessed by the image processor of the model
+    """
+
+    processor, _ = _load_dinov2(dinov2_model)
+    assert _DinoV2Transform.supports(processor)
+    transform = _DinoV2Transform(processor)
+
+    rng = np.random.default_rng(0)
+    image = Image.fromarray(
+        rng.integers(0, 256, (size[1], size[0], 3), dtype=np.uint8))
+    expected = processor(images=image, return_tensors="pt")["pixel_values"][0]
+    pixels = torch.from_numpy(transform(image))
+
+    assert pixels.shape == expected.shape
+    assert torch.allclose(pixels, expected, atol=1e-5)
+
+
+def test_transform_matches_processor_on_photo(image_file, dinov2_model):
+    """
+    Test that a photo preprocessed with Pillow and NumPy is the same as the
+    photo preprocessed by the image processor of the model
+    """
+
+    processor, _ = _load_dinov2(dinov2_model)
+    image = Image.open(image_file).convert('RGB')
+    expected = processor(images=image, return_tensors="pt")["pixel_values"][0]
+    pixels = torch.from_numpy(_DinoV2Transform(processor)(image))
+
+    assert torch.allclose(pixels, expected, atol=1e-5)
+
+
+def test_load_without_sdpa(monkeypatch):
+    """
+    Test that models are loaded with the default attention when the
+    installed transformers release doesn't support SDPA attention
+    """
+
+    calls = []
+
+    class Model:
+        def eval(self):
+            return self
+
+    def from_pretrained(model_name, **kwargs):
+        calls.append(kwargs)
+        if "attn_implementation" in kwargs:
+            raise ValueError("SDPA attention is not supported")
+        return Model()
+
+    monkeypatch.setattr(transformer.AutoModel, "from_pretrained",
+                        from_pretrained)
+    monkeypatch.setattr(transformer.AutoImageProcessor, "from_pretrained",
+                        lambda model_name: "processor")
+    transformer._load_dinov2.cache_clear()
+    try:
+        processor, model = transformer._load_dinov2("no-sdpa-model")
+    finally:
+        transformer._load_dinov2.cache_clear()
+
+    assert processor == "processor"
+    assert isinstance(model, Model)
+    assert calls == [{"torch_dtype": "auto", "attn_implementation": "sdpa"},
+                     {"torch_dtype": "auto"}]
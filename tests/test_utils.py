@@ -3,7 +3,9 @@ Units tests for utils.py
 Pytest will automatically run all functions that start with test_ in this file.
 """
 
+import io
 import warnings
+import requests
 from visarchpy import utils
 import pytest
 
@@ -32,3 +34,83 @@ def test_convert_dpi_to_point():
     assert utils.convert_dpi_to_point(1, 5) == pytest.approx(14.4)
 
 
+
+
+def test_extract_metadata_from_html(monkeypatch, tmp_path):
+    """Test extract_metadata_from_html function"""
+
+    html = (b'<html><body><fieldset class="other">'
+            b'<span class="label">Ignored</span></fieldset>'
+            b'<fieldset class="islandora islandora-metadata">'
+            b'<span class="label">Title</span>'
+            b'<span class="value"><p>A thesis</p></span>'
+            b'<span class="label">Author</span>'
+            b'<span class="value"><p>A. G\xc3\xb3mez</p></span>'
+            b'</fieldset></body></html>')
+
+    class Response:
+        content = html
+        # requests' encoding for a content type without charset
+        headers = {"content-type": "text/html"}
+        encoding = "ISO-8859-1"
+
+        def raise_for_status(self):
+            pass
+
+    requested = []
+
+    def get(url, *args, **kwargs):
+        requested.append(url)
+        return Response()
+
+    monkeypatch.setattr(utils._SESSION, "get", get)
+    utils._fetch_metadata_from_html.cache_clear()
+    url = "https://example.org/thesis"
+    metadata = utils.extract_metadata_from_html(url, cache_dir=tmp_path)
+    assert metadata == {"title": "A thesis", "author": "A. Gómez"}
+    # results are reused from memory, and from disk in a new process
+    assert utils.extract_metadata_from_html(url) == metadata
+    utils._fetch_metadata_from_html.cache_clear()
+    assert utils.extract_metadata_from_html(url, cache_dir=tmp_path) == \
+        metadata
+    assert requested == [url]
+
+
+def test_download_PDF(monkeypatch, tmp_path):
+    """Test download_PDF function"""
+
+    responses = []
+
+    class Response:
+        headers = {"content-disposition":
+                   'attachment; filename="thesis.pdf"; size=3',
+                   "content-length": "8"}
+
+        def __init__(self, status_code):
+            self.status_code = status_code
+            self.raw = io.BytesIO(b"pdf")
+            self.closed = False
+            responses.append(self)
+
+        def raise_for_status(self):
+            if self.status_code != 200:
+                raise requests.HTTPError(self.status_code)
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *args):
+            self.closed = True
+
+    monkeypatch.setattr(utils._SESSION, "get",
+                        lambda url, *args, **kwargs: Response(200))
+    utils.download_PDF("https://example.org/thesis", str(tmp_path))
+    # space reserved for the content-length is not left in the file
+    assert (tmp_path / "thesis.pdf").read_bytes() == b"pdf"
+
+    # responses are closed, also when the download fails
+    monkeypatch.setattr(utils._SESSION, "get",
+                        lambda url, *args, **kwargs: Response(404))
+    with pytest.raises(requests.HTTPError):
+        utils.download_PDF("https://example.org/missing", str(tmp_path))
+    assert [response.closed for response in responses] == [True, True]